@@ -14,6 +14,7 @@ from src.utils.i18n import create_translator_hub
 
 from src.utils.time_handler import start_logging
 from src.utils.utils import remove_logs
+from src.utils.redis_pool import close_redis_clients
 
 from scripts.get_locales import update_locales
 
@@ -44,6 +45,7 @@ async def main() -> None:
 
     finally:
         await bot.session.close()
+        await close_redis_clients()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,166 @@
+"""
+Throughput and latency of the gallery-open and profile-edit Sheets paths,
+measured against the local fake server (scripts/fake_sheets_server.py).
+
+    python -m scripts.bench_sheets --students 500 --opens 200 --edits 200 --concurrency 50 --latency-ms 80
+
+Scenarios:
+    gallery_open_uncached  every open reads the roster snapshot from Sheets
+    gallery_open_cached    opens served by RosterCache (memory tier only)
+    profile_edit_per_cell  one values PUT per edited cell (the old process_done path)
+    profile_edit_batched   edits flushed in batches as one values:batchUpdate (the outbox path)
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import Awaitable, Callable
+
+from src.config import Config, Google, Sheets, Cache
+from src.custom_types import RosterSnapshot
+from src import google_queries
+from src.utils.roster_cache import RosterCache
+from src.utils.sheets_async import SheetsAsync
+
+from scripts.fake_sheets_server import (
+    FakeSheets, FaultConfig, SPREADSHEET_ID, seed_roster, start_fake_sheets)
+
+
+def percentile(samples: list[float], q: float) -> float:
+
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+
+
+async def run_scenario(
+        name: str,
+        ops: int,
+        concurrency: int,
+        op: Callable[[int], Awaitable[None]]) -> dict:
+    """
+    Run `ops` calls of `op(i)` with at most `concurrency` in flight.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: list[float] = []
+
+    async def one(i: int):
+        async with semaphore:
+            started = time.perf_counter()
+            await op(i)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(ops)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "scenario": name,
+        "ops": ops,
+        "seconds": elapsed,
+        "ops_per_s": ops / elapsed,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "mean_ms": statistics.fmean(latencies) * 1000,
+    }
+
+
+def print_results(results: list[dict]) -> None:
+
+    print(f"{'scenario':<24}{'ops':>7}{'sec':>9}{'ops/s':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for r in results:
+        print(f"{r['scenario']:<24}{r['ops']:>7}{r['seconds']:>9.2f}{r['ops_per_s']:>10.1f}{r['p50_ms']:>10.1f}{r['p99_ms']:>10.1f}")
+
+
+async def main(args: argparse.Namespace) -> None:
+
+    sheets = FakeSheets(faults=FaultConfig(
+        latency_ms=args.latency_ms,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate))
+    tabs = seed_roster(sheets, students=args.students, teachers=args.teachers, interns=args.students // 3)
+    runner, base_url = await start_fake_sheets(sheets)
+
+    config: Config = Config.model_construct(
+        google=Google.model_construct(
+            onboarding_id=SPREADSHEET_ID,
+            student_vitrina_tab=tabs["student"],
+            teacher_vitrina_tab=tabs["teacher"],
+            intern_tab=tabs["intern"],
+            service_account_json="",
+            columns={}),
+        sheets=Sheets(base_url=base_url, read_per_minute=args.quota, write_per_minute=args.quota),
+        cache=Cache())
+
+    sheet: SheetsAsync = await google_queries.get_main_sheets_instance(config, "", True)
+    snapshot: RosterSnapshot = await google_queries.load_roster_snapshot(config)
+    await google_queries.seed_row_indexes(config, snapshot)
+    students = snapshot.students
+
+    results: list[dict] = []
+
+    async def open_uncached(i: int):
+        await google_queries.load_roster_snapshot(config)
+
+    results.append(await run_scenario("gallery_open_uncached", args.opens, args.concurrency, open_uncached))
+
+    cache: RosterCache[RosterSnapshot] = RosterCache(
+        lambda key: google_queries.load_roster_snapshot(config),
+        RosterSnapshot,
+        ttl=config.cache.roster_ttl,
+        stale_ttl=config.cache.roster_stale_ttl)
+
+    async def open_cached(i: int):
+        await cache.get(google_queries.ROSTER_KEY)
+
+    results.append(await run_scenario("gallery_open_cached", args.opens, args.concurrency, open_cached))
+
+    async def edit_per_cell(i: int):
+        student = students[i % len(students)]
+        await google_queries.update_cell_by_coordinates(config, "student", 8, student.row, f"Слоган {i}")
+
+    results.append(await run_scenario("profile_edit_per_cell", args.edits, args.concurrency, edit_per_cell))
+
+    batches = [
+        range(start, min(start + args.batch, args.edits))
+        for start in range(0, args.edits, args.batch)]
+
+    async def edit_batched(i: int):
+        cells = {
+            google_queries.person_cell(tabs["student"], 8, students[j % len(students)].id): f"Слоган {j}"
+            for j in batches[i]}
+        ranges = await google_queries.resolve_person_cells(config, list(cells))
+        await sheet.values_batch_update([
+            {"range": ranges[cell], "values": [[value]]} for cell, value in cells.items()])
+
+    batched = await run_scenario("profile_edit_batched", len(batches), args.concurrency, edit_batched)
+    # report per edit, not per flush, so the two edit scenarios compare directly
+    batched["ops"] = args.edits
+    batched["ops_per_s"] = args.edits / batched["seconds"]
+    results.append(batched)
+
+    print_results(results)
+    print(f"\nfake server requests: {dict(sheets.requests)}")
+    print(f"coalesced reads: {sum(v['coalesced'] for v in sheet.flight_stats().values())}")
+    print(f"quota: {sheet.quota_stats()}")
+
+    await sheet.close()
+    await runner.cleanup()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="SheetsAsync benchmark against the fake Sheets server")
+    parser.add_argument("--students", type=int, default=300)
+    parser.add_argument("--teachers", type=int, default=30)
+    parser.add_argument("--opens", type=int, default=200)
+    parser.add_argument("--edits", type=int, default=200)
+    parser.add_argument("--batch", type=int, default=20, help="edits per outbox flush")
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--quota", type=int, default=100_000, help="client-side requests per minute")
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,90 @@
+"""
+Backfill gallery and thumbnail variants for profile photos already in media/.
+
+    python -m scripts.build_derivatives            # latest photo of every user
+    python -m scripts.build_derivatives --all      # every 4_profile_* photo
+    python -m scripts.build_derivatives --force    # re-render up-to-date variants too
+
+Photos are rendered in a process pool. Face boxes kept in the photo index
+frame the avatar crops (other photos get a centered square). Afterwards the
+photo index in Redis is rebuilt so a bot that is not running picks the
+variants up on its next start (a running bot sees them through its media
+watcher).
+"""
+import argparse
+import asyncio
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import Config, load_config
+from src.utils.derivatives import is_up_to_date, render_derivatives
+from src.utils.photo_index import MEDIA_ROOT, PROFILE_PHOTO_PREFIX, PhotoIndex, profile_photo_dir
+from src.utils.redis_pool import get_redis, close_redis_clients
+
+
+def find_photos(root: str, latest_only: bool) -> list[str]:
+
+    photos: list[str] = []
+
+    for entry in sorted(os.scandir(root), key=lambda e: e.name):
+        if not entry.is_dir() or not entry.name.isdigit():
+            continue
+
+        try:
+            names = sorted(
+                f.name for f in os.scandir(profile_photo_dir(int(entry.name), root))
+                if f.is_file() and f.name.startswith(PROFILE_PHOTO_PREFIX))
+        except FileNotFoundError:
+            continue
+
+        if latest_only:
+            names = names[-1:]
+        photos.extend(os.path.join(profile_photo_dir(int(entry.name), root), name) for name in names)
+
+    return photos
+
+
+async def main(args: argparse.Namespace) -> None:
+
+    config: Config = load_config()
+    index = PhotoIndex(get_redis(config.redis.temp), root=args.root)
+    await index.load()
+    face_boxes = {record.path: record.face_box for record in index.records.values() if record.face_box}
+
+    photos = find_photos(args.root, latest_only=not args.all)
+    todo = [p for p in photos if args.force or not is_up_to_date(p)]
+    print(f"{len(photos)} photos, {len(todo)} to render")
+
+    loop = asyncio.get_running_loop()
+    failed = 0
+
+    with ProcessPoolExecutor(max_workers=args.workers or config.media.workers) as pool:
+        jobs = [
+            loop.run_in_executor(
+                pool, render_derivatives, photo,
+                config.media.gallery_size, config.media.thumb_size, config.media.avatar_size,
+                config.media.jpeg_quality, face_boxes.get(photo))
+            for photo in todo]
+
+        for photo, result in zip(todo, await asyncio.gather(*jobs, return_exceptions=True)):
+            if isinstance(result, Exception):
+                failed += 1
+                print(f"failed {photo}: {result}")
+
+    print(f"rendered {len(todo) - failed}, failed {failed}")
+
+    if not args.no_index:
+        await index.rebuild()
+    await close_redis_clients()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Build gallery variants of profile photos")
+    parser.add_argument("--root", default=MEDIA_ROOT)
+    parser.add_argument("--all", action="store_true", help="every profile photo, not only the latest per user")
+    parser.add_argument("--force", action="store_true", help="re-render variants that are up to date")
+    parser.add_argument("--workers", type=int, default=0, help="processes (default: media.workers)")
+    parser.add_argument("--no-index", action="store_true", help="do not rebuild the photo index in Redis")
+
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,182 @@
+"""
+Local stand-in for the face recognition microservice used when
+FACE_RECOGNITION_URL is set: POST /analyze (one "file" field) and
+POST /analyze_batch (repeated "files" fields, results in the same order).
+
+    python -m scripts.fake_face_service --port 8788 --latency-ms 150
+
+There is no detector: each image gets a face ratio derived from a hash of
+its bytes (so the same photo always gets the same answer), a centered face
+box of that size, and "Face not found" / "Face too small" for the low end.
+Point the bot at it with FACE_RECOGNITION_URL=http://127.0.0.1:8788.
+
+    python -m scripts.fake_face_service --bench --photos 6 --users 20
+
+runs the client side against an in-process instance and compares one new
+client per photo, the pooled client, and the pooled client with batches.
+"""
+import argparse
+import asyncio
+import io
+import math
+import time
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+
+import httpx
+from aiohttp import web
+from PIL import Image
+
+
+@dataclass
+class FakeFaceService:
+
+    latency_ms: float = 0.0
+    requests: Counter = field(default_factory=Counter)
+
+    def analyze(self, data: bytes) -> dict:
+
+        with Image.open(io.BytesIO(data)) as image:
+            width, height = image.size
+
+        # 0.00 .. 0.49, stable per image
+        face_ratio = (zlib.crc32(data) % 50) / 100
+
+        if face_ratio < 0.05:
+            return {"success": False, "error": "Face not found"}
+
+        if face_ratio <= 0.10:
+            return {"success": False, "error": f"Face too small ({face_ratio:.2f})", "face_ratio": face_ratio}
+
+        side = math.sqrt(face_ratio * width * height)
+        top, left = round((height - side) / 2), round((width - side) / 2)
+
+        return {
+            "success": True,
+            "face_ratio": face_ratio,
+            "face_location": [top, round(left + side), round(top + side), left],
+            "image_size": [width, height],
+        }
+
+
+def create_app(service: FakeFaceService) -> web.Application:
+
+    async def read_files(request: web.Request, name: str) -> list[bytes]:
+
+        reader = await request.multipart()
+        files: list[bytes] = []
+
+        async for part in reader:
+            if part.name == name:
+                files.append(await part.read())
+
+        return files
+
+    async def analyze(request: web.Request) -> web.Response:
+
+        service.requests["analyze"] += 1
+        files = await read_files(request, "file")
+        if not files:
+            raise web.HTTPBadRequest(text="No file")
+
+        await asyncio.sleep(service.latency_ms / 1000)
+        return web.json_response(service.analyze(files[0]))
+
+    async def analyze_batch(request: web.Request) -> web.Response:
+
+        service.requests["analyze_batch"] += 1
+        files = await read_files(request, "files")
+
+        # one model pass per request is what makes the batch cheaper on the real service
+        await asyncio.sleep(service.latency_ms / 1000)
+        return web.json_response({"results": [service.analyze(data) for data in files]})
+
+    app = web.Application(client_max_size=64 * 1024 * 1024)
+    app.router.add_post("/analyze", analyze)
+    app.router.add_post("/analyze_batch", analyze_batch)
+
+    return app
+
+
+async def start_fake_face_service(
+        service: FakeFaceService,
+        host: str = "127.0.0.1",
+        port: int = 0) -> tuple[web.AppRunner, str]:
+
+    runner = web.AppRunner(create_app(service))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}"
+
+
+def make_photos(count: int, size: tuple[int, int] = (1280, 960)) -> list[bytes]:
+
+    photos: list[bytes] = []
+    for ind in range(count):
+        buf = io.BytesIO()
+        Image.new("RGB", size, (40 * ind % 255, 90, 160)).save(buf, format="JPEG", quality=85)
+        photos.append(buf.getvalue())
+
+    return photos
+
+
+async def bench(args: argparse.Namespace) -> None:
+
+    from src.utils.face_client import FaceServiceClient
+
+    service = FakeFaceService(latency_ms=args.latency_ms)
+    runner, base_url = await start_fake_face_service(service)
+    photos = make_photos(args.photos)
+
+    async def per_photo_new_client():
+        for ind, data in enumerate(photos):
+            async with httpx.AsyncClient(timeout=15.0) as client:
+                await client.post(f"{base_url}/analyze", files={"file": (f"{ind}.jpg", data, "image/jpeg")})
+
+    client = FaceServiceClient(base_url, timeout=15.0, max_connections=10)
+
+    async def per_photo_pooled():
+        for ind, data in enumerate(photos):
+            await client.analyze(f"{ind}.jpg", io.BytesIO(data))
+
+    async def batched():
+        await client.analyze_batch([(f"{ind}.jpg", io.BytesIO(data)) for ind, data in enumerate(photos)])
+
+    print(f"{'mode':<24}{'users':>7}{'sec':>9}{'ms/user':>10}")
+    for name, run in (("new client per photo", per_photo_new_client),
+                      ("pooled, per photo", per_photo_pooled),
+                      ("pooled, batch", batched)):
+        started = time.perf_counter()
+        await asyncio.gather(*(run() for _ in range(args.users)))
+        elapsed = time.perf_counter() - started
+        print(f"{name:<24}{args.users:>7}{elapsed:>9.2f}{elapsed / args.users * 1000:>10.1f}")
+
+    print(f"\nfake service requests: {dict(service.requests)}")
+
+    await client.close()
+    await runner.cleanup()
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Fake face recognition service")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--latency-ms", type=float, default=100.0)
+    parser.add_argument("--bench", action="store_true", help="run the client benchmark instead of serving")
+    parser.add_argument("--photos", type=int, default=6, help="profile photos per user (bench)")
+    parser.add_argument("--users", type=int, default=20, help="concurrent users (bench)")
+    args = parser.parse_args()
+
+    if args.bench:
+        asyncio.run(bench(args))
+    else:
+        web.run_app(create_app(FakeFaceService(latency_ms=args.latency_ms)), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,372 @@
+"""
+Local stand-in for the subset of the Google Sheets v4 API used by SheetsAsync:
+values get / batchGet / update / append / batchUpdate, spreadsheets batchUpdate
+(addSheet) and spreadsheet metadata. Data lives in memory; latency, 429s and
+5xx errors can be injected.
+
+    python -m scripts.fake_sheets_server --port 8787 --students 300 --latency-ms 80 --rate-429 0.02
+
+Point the bot (or scripts/bench_sheets.py) at it with
+sheets.base_url = http://127.0.0.1:8787/v4/spreadsheets and an empty
+google.service_account_json.
+"""
+import argparse
+import asyncio
+import random
+import re
+from collections import Counter
+from dataclasses import dataclass, field
+
+from aiohttp import web
+
+
+SPREADSHEET_ID = "fake-spreadsheet"
+
+_A1 = re.compile(r"^(?P<c1>[A-Z]+)?(?P<r1>\d+)?(?::(?P<c2>[A-Z]+)?(?P<r2>\d+)?)?$")
+
+
+def column_letter(index: int) -> str:
+    """0 -> 'A', 26 -> 'AA'"""
+    letters = ""
+    index += 1
+    while index > 0:
+        index, rem = divmod(index - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
+
+
+def column_index(letters: str) -> int:
+    """'A' -> 0, 'Z' -> 25, 'AA' -> 26"""
+    index = 0
+    for ch in letters:
+        index = index * 26 + (ord(ch) - 64)
+    return index - 1
+
+
+@dataclass
+class Bounds:
+
+    tab: str
+    first_row: int  # 0-based, inclusive
+    last_row: int | None  # 0-based, inclusive; None = open-ended
+    first_col: int
+    last_col: int | None
+
+
+def parse_a1(a1_range: str) -> Bounds:
+
+    tab, _, cells = a1_range.partition("!")
+    tab = tab.strip("'")
+
+    if not cells:
+        return Bounds(tab, 0, None, 0, None)
+
+    m = _A1.match(cells.upper())
+    if m is None:
+        raise web.HTTPBadRequest(text=f"Unable to parse range: {a1_range}")
+
+    c1, r1, c2, r2 = m.group("c1"), m.group("r1"), m.group("c2"), m.group("r2")
+
+    if ":" not in cells:
+        # single cell
+        c2, r2 = c1, r1
+
+    return Bounds(
+        tab=tab,
+        first_row=int(r1) - 1 if r1 else 0,
+        last_row=int(r2) - 1 if r2 else None,
+        first_col=column_index(c1) if c1 else 0,
+        last_col=column_index(c2) if c2 else None,
+    )
+
+
+@dataclass
+class FaultConfig:
+
+    latency_ms: float = 0.0
+    jitter: float = 0.3  # +-30% of latency
+    rate_429: float = 0.0
+    retry_after: float = 1.0
+    error_rate: float = 0.0
+
+
+@dataclass
+class FakeSheets:
+
+    faults: FaultConfig = field(default_factory=FaultConfig)
+    spreadsheets: dict[str, dict[str, list[list[str]]]] = field(default_factory=dict)
+    requests: Counter = field(default_factory=Counter)
+
+    def grid(self, spreadsheet_id: str, tab: str) -> list[list[str]]:
+        tabs = self.spreadsheets.setdefault(spreadsheet_id, {})
+        if tab not in tabs:
+            raise web.HTTPBadRequest(text=f"Unable to parse range: {tab}")
+        return tabs[tab]
+
+    # ---- values ----
+    def read(self, spreadsheet_id: str, a1_range: str) -> dict:
+
+        b = parse_a1(a1_range)
+        grid = self.grid(spreadsheet_id, b.tab)
+        last_row = len(grid) - 1 if b.last_row is None else min(b.last_row, len(grid) - 1)
+
+        values: list[list[str]] = []
+        for row in grid[b.first_row:last_row + 1]:
+            end = len(row) if b.last_col is None else b.last_col + 1
+            cells = row[b.first_col:end]
+            while cells and cells[-1] == "":
+                cells.pop()
+            values.append(cells)
+
+        while values and not values[-1]:
+            values.pop()
+
+        res = {"range": a1_range, "majorDimension": "ROWS"}
+        if values:
+            res["values"] = values
+        return res
+
+    def write(self, spreadsheet_id: str, a1_range: str, values: list[list]) -> dict:
+
+        b = parse_a1(a1_range)
+        grid = self.grid(spreadsheet_id, b.tab)
+
+        for r, row in enumerate(values):
+            ri = b.first_row + r
+            while len(grid) <= ri:
+                grid.append([])
+            for c, value in enumerate(row):
+                ci = b.first_col + c
+                while len(grid[ri]) <= ci:
+                    grid[ri].append("")
+                grid[ri][ci] = "" if value is None else str(value)
+
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "updatedRange": a1_range,
+            "updatedRows": len(values),
+            "updatedCells": sum(len(row) for row in values),
+        }
+
+    def append(self, spreadsheet_id: str, a1_range: str, values: list[list]) -> dict:
+
+        b = parse_a1(a1_range)
+        grid = self.grid(spreadsheet_id, b.tab)
+
+        last = len(grid)
+        while last > 0 and not any(grid[last - 1]):
+            last -= 1
+
+        target = f"{b.tab}!{column_letter(b.first_col)}{last + 1}"
+        return {"spreadsheetId": spreadsheet_id, "updates": self.write(spreadsheet_id, target, values)}
+
+    # ---- spreadsheet ----
+    def metadata(self, spreadsheet_id: str) -> dict:
+
+        tabs = self.spreadsheets.setdefault(spreadsheet_id, {})
+        return {
+            "spreadsheetId": spreadsheet_id,
+            "sheets": [
+                {"properties": {
+                    "title": title,
+                    "sheetId": ind,
+                    # like a real sheet, the grid is larger than the rows in use
+                    "gridProperties": {"rowCount": max(len(grid), 1000), "columnCount": 26}}}
+                for ind, (title, grid) in enumerate(tabs.items())
+            ],
+        }
+
+    def batch_update(self, spreadsheet_id: str, requests: list[dict]) -> dict:
+
+        tabs = self.spreadsheets.setdefault(spreadsheet_id, {})
+        replies = []
+
+        for req in requests:
+            if "addSheet" in req:
+                title = req["addSheet"]["properties"]["title"]
+                tabs.setdefault(title, [])
+                replies.append({"addSheet": {"properties": {"title": title, "sheetId": list(tabs).index(title)}}})
+            else:
+                replies.append({})
+
+        return {"spreadsheetId": spreadsheet_id, "replies": replies}
+
+
+def strip_to_fields(res: dict, fields: str | None) -> dict:
+    """Only the `valueRanges(values)` mask used by the bot is understood."""
+    if fields == "valueRanges(values)":
+        return {"valueRanges": [
+            {"values": vr["values"]} if "values" in vr else {}
+            for vr in res["valueRanges"]]}
+    return res
+
+
+def create_app(sheets: FakeSheets) -> web.Application:
+
+    async def handle(request: web.Request) -> web.Response:
+
+        faults = sheets.faults
+
+        if faults.latency_ms:
+            spread = faults.latency_ms * faults.jitter
+            await asyncio.sleep(max(0.0, random.uniform(faults.latency_ms - spread, faults.latency_ms + spread)) / 1000)
+
+        if random.random() < faults.rate_429:
+            sheets.requests["429"] += 1
+            return web.json_response(
+                {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                status=429, headers={"Retry-After": str(faults.retry_after)})
+
+        if random.random() < faults.error_rate:
+            sheets.requests["500"] += 1
+            return web.json_response({"error": {"code": 500, "status": "INTERNAL"}}, status=500)
+
+        tail = request.match_info["tail"]
+        spreadsheet_id, _, rest = tail.partition("/")
+        method = request.method
+
+        if not rest:
+            if spreadsheet_id.endswith(":batchUpdate") and method == "POST":
+                sheets.requests["batchUpdate"] += 1
+                body = await request.json()
+                return web.json_response(sheets.batch_update(spreadsheet_id.removesuffix(":batchUpdate"), body.get("requests", [])))
+            if method == "GET":
+                sheets.requests["metadata"] += 1
+                return web.json_response(sheets.metadata(spreadsheet_id))
+
+        elif rest == "values:batchGet" and method == "GET":
+            sheets.requests["batchGet"] += 1
+            res = {
+                "spreadsheetId": spreadsheet_id,
+                "valueRanges": [sheets.read(spreadsheet_id, r) for r in request.query.getall("ranges", [])],
+            }
+            return web.json_response(strip_to_fields(res, request.query.get("fields")))
+
+        elif rest == "values:batchUpdate" and method == "POST":
+            sheets.requests["valuesBatchUpdate"] += 1
+            body = await request.json()
+            responses = [sheets.write(spreadsheet_id, d["range"], d["values"]) for d in body.get("data", [])]
+            return web.json_response({
+                "spreadsheetId": spreadsheet_id,
+                "totalUpdatedCells": sum(r["updatedCells"] for r in responses),
+                "responses": responses,
+            })
+
+        elif rest.startswith("values/"):
+            a1_range = rest.removeprefix("values/")
+
+            if a1_range.endswith(":append") and method == "POST":
+                sheets.requests["append"] += 1
+                body = await request.json()
+                return web.json_response(sheets.append(spreadsheet_id, a1_range.removesuffix(":append"), body.get("values", [])))
+
+            if method == "GET":
+                sheets.requests["get"] += 1
+                return web.json_response(sheets.read(spreadsheet_id, a1_range))
+
+            if method == "PUT":
+                sheets.requests["update"] += 1
+                body = await request.json()
+                return web.json_response(sheets.write(spreadsheet_id, a1_range, body.get("values", [])))
+
+        raise web.HTTPNotFound(text=f"{method} {request.path} is not implemented by the fake server")
+
+    app = web.Application()
+    app.router.add_route("*", "/v4/spreadsheets/{tail:.*}", handle)
+    return app
+
+
+def seed_roster(
+        sheets: FakeSheets,
+        spreadsheet_id: str = SPREADSHEET_ID,
+        students: int = 100,
+        teachers: int = 20,
+        interns: int = 30) -> dict[str, str]:
+    """
+    Fill student / teacher / intern tabs in the layout google_queries expects.
+    Returns the tab names.
+    """
+    from src.google_queries import STUDENT_COLUMNS, TEACHER_COLUMNS, INTERN_COLUMNS, FIRST_DATA_ROW
+
+    tabs = {"student": "Students", "teacher": "Teachers", "intern": "Interns"}
+
+    def make_rows(columns: dict[str, int], count: int, first_id: int, role: str) -> list[list[str]]:
+        width = max(columns.values()) + 1
+        header = [""] * width
+        for name, position in columns.items():
+            header[position] = name
+        # header row, then blank rows up to the first data row
+        rows = [header] + [[""] * width for _ in range(FIRST_DATA_ROW - 2)]
+
+        for i in range(count):
+            row = [""] * width
+            values = {
+                "id": str(first_id + i),
+                "name": f"Имя{i} Фамилия{i}" if role == "student" else f"Фамилия{i} Имя{i} Отчество{i}",
+                "username": f"https://t.me/user{first_id + i}",
+                "slogan": f"Слоган {i}",
+                "prof_experience": "Опыт " * 40,
+                "about": "О себе " * 60,
+                "tags": "python, data, design",
+                "expectations": "Ожидания " * 10,
+                "mission": "Миссия " * 10,
+                "telegraph_page": f"https://telegra.ph/page-{first_id + i}",
+                "internship": f"Компания {i}",
+            }
+            for name, position in columns.items():
+                row[position] = values[name]
+            rows.append(row)
+
+        return rows
+
+    sheets.spreadsheets[spreadsheet_id] = {
+        tabs["student"]: make_rows(STUDENT_COLUMNS, students, 100_000, "student"),
+        tabs["teacher"]: make_rows(TEACHER_COLUMNS, teachers, 200_000, "teacher"),
+        tabs["intern"]: make_rows(INTERN_COLUMNS, interns, 100_000, "intern"),
+    }
+
+    return tabs
+
+
+async def start_fake_sheets(
+        sheets: FakeSheets,
+        host: str = "127.0.0.1",
+        port: int = 0) -> tuple[web.AppRunner, str]:
+    """
+    Start the server in the running loop; returns the runner and the base URL for SheetsAsync.
+    """
+    runner = web.AppRunner(create_app(sheets), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+
+    bound_port = runner.addresses[0][1]
+    return runner, f"http://{host}:{bound_port}/v4/spreadsheets"
+
+
+def main():
+
+    parser = argparse.ArgumentParser(description="Fake Google Sheets v4 server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--students", type=int, default=100)
+    parser.add_argument("--teachers", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--rate-429", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    sheets = FakeSheets(faults=FaultConfig(
+        latency_ms=args.latency_ms,
+        rate_429=args.rate_429,
+        retry_after=args.retry_after,
+        error_rate=args.error_rate))
+    tabs = seed_roster(sheets, students=args.students, teachers=args.teachers)
+
+    print(f"Spreadsheet id: {SPREADSHEET_ID}, tabs: {tabs}")
+    web.run_app(create_app(sheets), host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
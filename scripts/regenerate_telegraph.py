@@ -0,0 +1,55 @@
+"""
+Rebuild the Telegraph page of every student and teacher, e.g. after the page
+template changed or rows were imported into the vitrina tabs by hand.
+
+    python -m scripts.regenerate_telegraph            # resume or start a run
+    python -m scripts.regenerate_telegraph --force    # publish unchanged pages too
+    python -m scripts.regenerate_telegraph --restart  # ignore the checkpoint
+
+The roster is read once from Sheets. Pages are published with
+telegraph.bulk_concurrency workers under the client's rate limit; pages whose
+content is already live are skipped. Progress is checkpointed in Redis, so
+an interrupted run picks up where it stopped. The admin panel starts the
+same job with its "Rebuild Telegraph pages" button.
+"""
+import argparse
+import asyncio
+
+from src.config import Config, load_config
+from src.telegraph_queries import regenerate_telegraph_pages
+from src.utils.telegraph_async import close_telegraph_client
+from src.utils.telegraph_queue import close_telegraph_queue
+from src.utils.redis_pool import close_redis_clients
+
+
+def print_progress(status: dict[str, str]) -> None:
+
+    finished = int(status["published"]) + int(status["unchanged"]) + int(status["failed"])
+    print(
+        f"\r{finished}/{status['total']}: {status['published']} published, "
+        f"{status['unchanged']} unchanged, {status['failed']} failed", end="", flush=True)
+
+
+async def main(args: argparse.Namespace) -> None:
+
+    config: Config = load_config()
+
+    try:
+        status = await regenerate_telegraph_pages(
+            config, force=args.force, restart=args.restart, on_progress=print_progress)
+        print()
+        print("another run is in progress" if status is None else f"{status['state']}: {status}")
+
+    finally:
+        await close_telegraph_queue(timeout=config.telegraph.timeout)
+        await close_telegraph_client()
+        await close_redis_clients()
+
+
+if __name__ == "__main__":
+
+    parser = argparse.ArgumentParser(description="Rebuild every Telegraph page")
+    parser.add_argument("--force", action="store_true", help="publish pages whose content is unchanged")
+    parser.add_argument("--restart", action="store_true", help="start over instead of resuming")
+
+    asyncio.run(main(parser.parse_args()))
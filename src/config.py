@@ -1,6 +1,6 @@
 import yaml
 from pydantic import \
-    BaseModel, PositiveInt, ValidationError, HttpUrl, Field
+    BaseModel, PositiveInt, PositiveFloat, ValidationError, HttpUrl, Field
 
 
 class System(BaseModel):
@@ -49,10 +49,75 @@ class Google(BaseModel):
     teacher_vitrina_tab: str
     intern_tab: str
     service_account_json: str
+    # optional header titles per tab ("student" / "teacher" / "intern"): {field: title};
+    # they move both the columns the roster is read from and the ones edits are written to
+    columns: dict[str, dict[str, str]] = Field(default_factory=dict)
 
 
 class Telegraph(BaseModel):
+
     access_token: str
+    base_url: str = "https://api.telegra.ph"
+    timeout: PositiveFloat = 10.0  # seconds per request
+    retries: PositiveInt = 4  # attempts per page update
+    per_minute: PositiveInt = 30  # client-side rate limit for Telegraph requests
+    quiet_period: PositiveFloat = 10.0  # seconds without edits before a page is published
+    bulk_concurrency: PositiveInt = 4  # pages published at once when regenerating the whole roster
+    bulk_lock_ttl: PositiveInt = 600  # seconds a silent regeneration run keeps others from starting
+
+
+class Sheets(BaseModel):
+
+    base_url: str = "https://sheets.googleapis.com/v4/spreadsheets"  # a local stand-in for load tests
+    outbox_flush_interval: PositiveFloat = 5.0  # seconds between outbox flushes
+    read_per_minute: PositiveInt = 60  # client-side quota for read requests
+    write_per_minute: PositiveInt = 60  # client-side quota for write requests
+    chunk_rows: PositiveInt = 500  # rows per window when reading large tabs
+    parallel_chunks: PositiveInt = 3  # windows of one tab fetched concurrently
+
+
+class Cache(BaseModel):
+
+    roster_ttl: PositiveInt = 60  # seconds a roster is served as fresh
+    roster_stale_ttl: PositiveInt = 600  # extra seconds a stale roster is served while refreshing
+    roster_version_ttl: PositiveInt = 86400  # seconds an open gallery can still resolve its roster version
+    roster_versions_kept: PositiveInt = 10  # roster versions kept in Redis for open galleries, newest first
+    media_id_ttl: PositiveInt = 30 * 86400  # seconds a Telegram file id of a local photo is reused
+    prefetch_per_user: PositiveInt = 2  # neighbour profiles warmed at once for one viewer
+    prefetch_uploads: PositiveInt = 2  # photo uploads to the cache chat at once, across viewers
+    media_cache_chat_id: int | None = None  # chat where unsent photos are uploaded to get a file id
+    face_box_ttl: PositiveInt = 30 * 86400  # seconds a detected face box is kept for cropping
+
+
+class Media(BaseModel):
+
+    workers: PositiveInt = 2  # processes for image work (derivatives)
+    gallery_size: PositiveInt = 1280  # longest side of the photo shown in the gallery
+    thumb_size: PositiveInt = 320
+    avatar_size: PositiveInt = 640  # side of the face-centered square shown in the gallery
+    jpeg_quality: PositiveInt = 85
+    ingest_workers: PositiveInt = 4  # media ingestion jobs handled at once
+    max_downloads: PositiveInt = 2  # Telegram file downloads at once, across ingestion workers
+    ingest_retries: PositiveInt = 3  # download attempts per job
+    ingest_job_ttl: PositiveInt = 86400  # seconds a finished job's status is kept for the admin panel
+
+
+class Face(BaseModel):
+
+    workers: PositiveInt = 2  # processes running face_recognition
+    queue_size: PositiveInt = 8  # photos allowed to wait for a free worker
+    timeout: PositiveFloat = 20.0  # seconds before an analysis is given up
+    profile_concurrency: PositiveInt = 3  # profile photos analysed at once during onboarding
+    clear_winner_ratio: PositiveFloat = 0.25  # face ratio that ends the search for a better profile photo
+    service_timeout: PositiveFloat = 15.0  # seconds per request to FACE_RECOGNITION_URL
+    service_max_connections: PositiveInt = 10  # pooled keep-alive connections to the face service
+    detect_max_side: PositiveInt = 800  # photos are downscaled to this side before face detection
+    # prefilter: photos failing these never reach the detector
+    min_side: PositiveInt = 320  # pixels, shorter side
+    min_brightness: float = 40.0  # mean gray level, 0..255
+    max_brightness: float = 225.0
+    min_contrast: float = 12.0  # gray level standard deviation
+    min_sharpness: float = 15.0  # Laplacian variance on a 256px grayscale copy
 
 
 class OpenAI(BaseModel):
@@ -81,6 +146,10 @@ class Config(BaseModel):
     system_prompt: SystemPrompt
     google: Google
     telegraph: Telegraph
+    sheets: Sheets = Field(default_factory=Sheets)
+    cache: Cache = Field(default_factory=Cache)
+    media: Media = Field(default_factory=Media)
+    face: Face = Field(default_factory=Face)
 
 # Load the YAML configuration file
 def load_config() -> Config:
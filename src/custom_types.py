@@ -1,5 +1,7 @@
 from typing import Any, Literal
 import re
+import json
+import hashlib
 
 from pydantic import BaseModel, field_validator, ValidationInfo, HttpUrl
 from pydantic import PositiveInt, Field
@@ -15,7 +17,6 @@ class Person(BaseModel):
     prof_experience: str | None = Field(default=None)
     about: str | None = Field(default=None)
     tags: list[str] | None = Field(default=None) # Интересы
-    image_path: str | None = Field(default=None)
     telegraph_page: HttpUrl | str = Field(default="")
     row: PositiveInt
 
@@ -58,19 +59,6 @@ class Person(BaseModel):
 
         else:
             return ""
-        
-    def get_latest_image_path(self, all_images: list[str]):
-
-        filtered_images: list[str] = [
-            image 
-            for image in all_images 
-            if f"{self.id}" in image
-        ]
-        
-        if filtered_images:
-            self.image_path = sorted(filtered_images)[-1]
-        else:
-            self.image_path = None
 
 
 class Teacher(Person):
@@ -86,6 +74,161 @@ class Student(Person):
     internship: str | None = Field(default=None)
 
 
+class RosterSnapshot(BaseModel):
+
+    version: str # content hash, changes whenever the sheet data does
+    date: str = Field(default_factory=get_datetime_now)
+    students: list[Student] = Field(default_factory=list)
+    teachers: list[Teacher] = Field(default_factory=list)
+
+    @classmethod
+    def create(cls, students: list[Student], teachers: list[Teacher]) -> "RosterSnapshot":
+
+        content = json.dumps(
+            [[s.model_dump(mode="json") for s in students], [t.model_dump(mode="json") for t in teachers]],
+            ensure_ascii=False, sort_keys=True)
+
+        return cls(
+            version=hashlib.sha1(content.encode()).hexdigest()[:12],
+            students=students,
+            teachers=teachers)
+
+
+class Gallery:
+    """
+    Persons of one role as shown in the gallery, built once per roster snapshot.
+
+    Lookups by id and carousel neighbours are precomputed, so navigating
+    profiles is a couple of tuple reads.
+    """
+
+    __slots__ = ("version", "persons", "positions", "back", "next", "display_names", "items", "cards")
+
+    def __init__(self, version: str, persons: list[Student | Teacher]):
+
+        num = len(persons)
+
+        self.version: str = version
+        self.persons: tuple[Student | Teacher, ...] = tuple(persons)
+        self.positions: dict[int, int] = {p.id: ind for ind, p in enumerate(persons)}
+        self.back: tuple[int, ...] = tuple((ind - 1) % num for ind in range(num))
+        self.next: tuple[int, ...] = tuple((ind + 1) % num for ind in range(num))
+        self.display_names: tuple[str, ...] = tuple(p.get_display_name() for p in persons)
+        self.items: tuple[tuple[str, int], ...] = tuple((p.name, p.id) for p in persons)
+        self.cards: dict[int, dict[str, Any]] = {}
+
+    def __len__(self) -> int:
+        return len(self.persons)
+
+    def position(self, person_id: int | None) -> int | None:
+        """Position of a person in this gallery; None when they are not in it."""
+        return self.positions.get(person_id)
+
+    def indexes(self, position: int) -> tuple[int, int, int]:
+        """(current, back, next) positions for a carousel standing at `position`."""
+        return position, self.back[position], self.next[position]
+
+    def card(self, position: int) -> dict[str, Any]:
+        """
+        Profile text of the person at `position`, rendered on first use.
+        """
+        card = self.cards.get(position)
+        if card is not None:
+            return card
+
+        person = self.persons[position]
+
+        card = {
+            "person_name": (person.name, person.username),
+            "person_slogan": f"\n💡 {person.slogan}" if person.slogan else "",
+            "telegraph_page": person.telegraph_page,
+            "person_tags": f"\n🏷️ #{' #'.join(person.tags)}" if person.tags else "",
+            "back_person": self.display_names[self.back[position]],
+            "next_person": self.display_names[self.next[position]],
+        }
+
+        if isinstance(person, Student):
+            card["person_expectations"] = f"\n🎯 {person.expectations}" if person.expectations else ""
+        else:
+            card["person_mission"] = f"\n🎯 {person.mission}" if person.mission else ""
+
+        self.cards[position] = card
+        return card
+
+
+class FaceBox(BaseModel):
+    """Face bounding box as fractions of the image width/height."""
+
+    top: float
+    right: float
+    bottom: float
+    left: float
+
+    @classmethod
+    def from_pixels(cls, location: tuple[int, int, int, int], width: int, height: int) -> "FaceBox":
+        """From a face_recognition (top, right, bottom, left) location."""
+        top, right, bottom, left = location
+        return cls(top=top / height, right=right / width, bottom=bottom / height, left=left / width)
+
+
+class FaceAnalysis(BaseModel):
+
+    success: bool
+    error: str | None = Field(default=None)
+    face_ratio: float | None = Field(default=None)
+
+
+class PhotoRecord(BaseModel):
+
+    path: str
+    mtime: float
+    size: int
+    file_id: str | None = Field(default=None) # Telegram file id, when the photo came through the bot
+    gallery_path: str | None = Field(default=None) # downscaled, EXIF-free variant shown in the gallery
+    thumb_path: str | None = Field(default=None)
+    avatar_path: str | None = Field(default=None) # square crop around the face
+    face_box: FaceBox | None = Field(default=None) # from face detection, kept so crops can be redone without it
+
+    @property
+    def display_path(self) -> str:
+        # without a detected face the avatar is a blind centre crop; the whole picture is better
+        if self.avatar_path and self.face_box is not None:
+            return self.avatar_path
+        return self.gallery_path or self.path
+
+
+class MediaJob(BaseModel):
+    """A Telegram file waiting to be downloaded to `destination`."""
+
+    id: str
+    kind: Literal["voice", "video_note", "photo"]
+    user_id: PositiveInt
+    file_id: str
+    file_unique_id: str | None = Field(default=None)
+    destination: str
+    status: Literal["queued", "downloading", "retrying", "done", "failed"] = "queued"
+    attempts: int = 0
+    error: str | None = Field(default=None)
+    created: str = Field(default_factory=get_datetime_now)
+    updated: str = Field(default_factory=get_datetime_now)
+
+
+class TelegraphPage(BaseModel):
+    """A rendered Telegraph page, ready for editPage."""
+
+    path: str
+    title: str
+    html_content: str
+    author_name: str | None = Field(default=None)
+    author_url: str | None = Field(default=None)
+
+    @property
+    def content_hash(self) -> str:
+        # the path identifies the page, everything else is what a reader sees
+        content = json.dumps(self.model_dump(exclude={"path"}), ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+
 class UserNotify(BaseModel):
 
     id: PositiveInt
@@ -1,8 +1,10 @@
+import html
 import logging
 import operator
 
 from datetime import datetime
 
+from aiogram.types import CallbackQuery
 from aiogram.fsm.storage.redis import RedisStorage
 from aiogram_dialog import \
     Dialog, Window, LaunchMode, DialogManager, StartMode, ShowMode
@@ -10,13 +12,17 @@ from aiogram_dialog.widgets.kbd import \
     Button, ListGroup, Url, ManagedRadio, Row, Radio, Start
 from aiogram_dialog.widgets.text import Format, Const
 
-from ..custom_types import UserData, UserAction
+from ..custom_types import UserData, UserAction, MediaJob
 
 from ..config import Config
 from ..states import Admin, Onboarding
 
 from ..utils.pusher import run_pusher, finish_onboarding
 from ..utils.utils import get_middleware_data
+from ..utils.media_id_storage import get_media_id_storage
+from ..utils.media_queue import get_media_queue
+from ..telegraph_queries import \
+    get_regeneration_status, regeneration_running, start_telegraph_regeneration
 
 from my_tools import get_users, Langs, get_time_delta
 
@@ -97,6 +103,23 @@ async def get_last_users(
         }
 
 
+async def rebuild_telegraph_pages(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+
+    _, config, _ = get_middleware_data(dialog_manager)
+
+    start_telegraph_regeneration(config)
+    await callback.answer("📰 Telegraph pages are being rebuilt")
+
+
+MEDIA_JOB_ICONS = {"queued": "⏳", "downloading": "📥", "retrying": "🔁", "done": "✅", "failed": "❌"}
+
+
+def format_media_job(job: MediaJob) -> str:
+
+    line = f"{MEDIA_JOB_ICONS[job.status]} {job.kind} {job.user_id} ×{job.attempts}"
+    return f"{line}: {html.escape(job.error)}" if job.error else line
+
+
 async def dialog_get_data(
         dialog_manager: DialogManager,
         config: Config,
@@ -108,8 +131,24 @@ async def dialog_get_data(
     if not value_counter:
         await temp.redis.set(f"{config.bot.id}:counter", 1)
     
+    media_ids: dict[str, int] = get_media_id_storage(config).stats()
+
+    regen: dict[str, str] = await get_regeneration_status(config)
+    regen_line = (
+        f"\n📰 Telegraph: {regen['state']}, "
+        f"{int(regen['published']) + int(regen['unchanged'])}/{regen['total']} "
+        f"({regen['published']} published, {regen['failed']} failed)") if regen else ""
+
+    media_queue = get_media_queue(config)
+    depth: dict[str, int] = await media_queue.depth()
+    jobs_lines = "".join(f"\n{format_media_job(job)}" for job in await media_queue.recent(5))
+
     data = {
-        "stats": f"📊<b>{config.bot.name}:</b>",
+        "stats": f"📊<b>{config.bot.name}:</b>\n"
+                 f"🖼️ Media ids: {media_ids['hits']} hits / {media_ids['misses']} misses"
+                 f"{regen_line}\n"
+                 f"📥 Media queue: {depth['queued']} queued, {depth['processing']} in progress"
+                 f"{jobs_lines}",
         "value_counter": int(value_counter) if value_counter else 1
     }
 
@@ -120,6 +159,9 @@ async def dialog_get_data(
 
     data["finish_onboarding"] = True
 
+    if user_data.id in config.superadmins.ids and not await regeneration_running(config):
+        data["rebuild_telegraph"] = True
+
     return data
 
 
@@ -139,6 +181,13 @@ dialog = Dialog(
             when="finish_onboarding"
         ),
         
+        Button(
+            text=Const("📰 Rebuild Telegraph pages"),
+            id="rebuild_telegraph_id",
+            on_click=rebuild_telegraph_pages,
+            when="rebuild_telegraph"
+        ),
+
         # Button(
         #     text=Format("🔥 Run pusher ({value_counter})"),
         #     id="run_pusher_id",
@@ -16,8 +16,8 @@ from aiogram_dialog.widgets.input import TextInput, MessageInput, ManagedTextInp
 from ..utils.boarding_handlers import correct_name_handler, error_name_handler, download_photo
 from ..utils.utils import get_middleware_data
 
-from ..google_queries import update_cell_by_coordinates
-from ..telegraph_queries import update_telegraph_page
+from ..google_queries import enqueue_person_update, update_roster_person
+from ..telegraph_queries import schedule_telegraph_update
 
 from ..states import EditMode, Flow
 
@@ -31,14 +31,32 @@ if TYPE_CHECKING:
     from ..locales.stub import TranslatorRunner
 
 
+# Fields that can be edited here, and those that are shown on the Telegraph page
+EDITABLE_FIELDS = ("name", "slogan", "prof_experience", "about", "tags", "expectations", "mission")
+TELEGRAPH_FIELDS = {"name", "prof_experience", "about"}
+
+
 async def on_dialog_start(
         start_data: Any,
         dialog_manager: DialogManager):
 
     dialog_manager.dialog_data["person"] = start_data["current_person_data"]
+    dialog_manager.dialog_data["original"] = dict(start_data["current_person_data"])
     dialog_manager.dialog_data["role"] = start_data["role"]
 
 
+def changed_fields(dialog_manager: DialogManager) -> dict[str, Any]:
+    """
+    Fields of the person edited in this session, with their new values.
+    """
+    person: dict = dialog_manager.dialog_data["person"]
+    original: dict = dialog_manager.dialog_data.get("original", {})
+
+    return {
+        field: person[field] for field in EDITABLE_FIELDS
+        if field in person and person[field] != original.get(field)}
+
+
 async def dialog_get_data(
         i18n: TranslatorRunner,
         dialog_manager: DialogManager,
@@ -59,7 +77,9 @@ async def dialog_get_data(
         "edit_mission_btn": i18n.edit.edit_mission_btn(),
         "done_btn": i18n.service.done_btn(),
         "back_btn": i18n.service.back_btn(),
+        "save_btn": i18n.edit.save_btn(),
         "role": role,
+        "has_changes": bool(changed_fields(dialog_manager)),
     })
 
     return data
@@ -118,10 +138,13 @@ async def getter_for_edition(dialog_manager: DialogManager, **kwargs):
 
     role = dialog_manager.dialog_data.get("role", "student")
 
+    # a value typed but not confirmed with Done is shown, not yet kept
+    fields: dict = {**dialog_manager.dialog_data.get("person"), **dialog_manager.dialog_data.get("staged", {})}
+
     if role == "student":
-        person: Student = Student(**dialog_manager.dialog_data.get("person"))
+        person: Student = Student(**fields)
     else:
-        person: Teacher = Teacher(**dialog_manager.dialog_data.get("person"))
+        person: Teacher = Teacher(**fields)
 
     data: dict[str, str] = {
         "name": f"<b>{person.name}</b>",
@@ -142,65 +165,57 @@ async def getter_for_edition(dialog_manager: DialogManager, **kwargs):
     return data
 
 
-async def process_done(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+async def process_field_done(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+    """
+    Keep the new value in the session and go back to the field list; nothing is written yet.
+    """
+    dialog_manager.dialog_data["person"].update(dialog_manager.dialog_data.pop("staged", {}))
+    dialog_manager.dialog_data["edit_mode"] = False
+    await dialog_manager.switch_to(EditMode.MAIN)
 
-    _,config, _ = get_middleware_data(dialog_manager)
 
-    current_state = dialog_manager.current_context().state
+async def discard_field(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+    """
+    Leaving a field with Back drops the value typed there.
+    """
+    dialog_manager.dialog_data.pop("staged", None)
+    dialog_manager.dialog_data["edit_mode"] = False
 
-    row = dialog_manager.dialog_data.get("person").get("row")
-    role = dialog_manager.dialog_data.get("role", "student")
-    telegraph_status: bool = False
 
-    match current_state:
+async def save_session(dialog_manager: DialogManager) -> None:
+    """
+    Commit every field changed in the session at once: one outbox write
+    (one values:batchUpdate), one roster patch and at most one Telegraph publish.
+    """
+    _,config, _ = get_middleware_data(dialog_manager)
 
-        case EditMode.EDIT_NAME:
-            column = 1
-            value = "name"
-            telegraph_status = True
+    person: dict = dialog_manager.dialog_data.get("person")
+    role = dialog_manager.dialog_data.get("role", "student")
+    changes = changed_fields(dialog_manager)
 
-        case EditMode.EDIT_SLOGAN:
+    if changes:
+        # acknowledged right away, the outbox worker writes it to Sheets in the background
+        await enqueue_person_update(config, role, person.get("id"), changes)
 
-            column = 7 if role == "student" else 8
-            value = "slogan"
+        await update_roster_person(config, role, person)
 
-        case EditMode.EDIT_PROF_EXPERIENCE:
-            column = 8 if role == "student" else 5
-            value = "prof_experience"
-            telegraph_status = True
+        if TELEGRAPH_FIELDS & changes.keys():
+            schedule_telegraph_update(config, person, role)
 
-        case EditMode.EDIT_ABOUT:
-            column = 9 if role == "student" else 4
-            value = "about"
-            telegraph_status = True
+        dialog_manager.dialog_data["original"] = dict(person)
 
-        case EditMode.EDIT_TAGS:
-            column = 11 if role == "student" else 6
-            value = "tags"
-
-        case EditMode.EDIT_EXPECTATIONS:
-            column = 14
-            value = "expectations"
-
-        case EditMode.EDIT_MISSION:
-            column = 7
-            value = "mission"
 
-        case _:
-            pass
+async def process_done(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
 
-    await update_cell_by_coordinates(
-        config=config,
-        role=role,
-        column=column + 1,
-        row=row,
-        value=dialog_manager.dialog_data.get("person").get(value)
-    )
+    await save_session(dialog_manager)
+    await dialog_manager.done(result={"person": dialog_manager.dialog_data.get("person")})
 
-    if telegraph_status:
-        update_telegraph_page(config, dialog_manager.dialog_data.get("person"), role)
 
-    await dialog_manager.done(result={"person": dialog_manager.dialog_data.get("person")})
+async def save_on_leave(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
+    """
+    Leaving the editor to the menu keeps the fields confirmed so far instead of dropping them.
+    """
+    await save_session(dialog_manager)
 
 
 async def correct_input_handler(
@@ -236,7 +251,7 @@ async def correct_input_handler(
         case _:
             pass
 
-    dialog_manager.dialog_data["person"][value] = text
+    dialog_manager.dialog_data.setdefault("staged", {})[value] = text
     dialog_manager.dialog_data["edit_mode"] = True
 
 
@@ -255,15 +270,17 @@ async def handle_photo(
 
     await download_photo(message, dialog_manager)
 
-    await message.answer(text='✅ Фотография успешно загружена')
+    await message.answer(text='✅ Фотография получена, скоро она появится в профиле')
     await asyncio.sleep(1)
 
+    # the menu restart below ends the session, so the fields confirmed in it are saved first
+    await save_session(dialog_manager)
     await dialog_manager.start(Flow.MENU, mode=StartMode.RESET_STACK)
 
 
 BACK_DONE_BTNS = Row(
-    Back(Format("{back_btn}")),
-    Button(Format("{done_btn}"), id="done_btn_id", on_click=process_done, when="edit_mode")
+    Back(Format("{back_btn}"), on_click=discard_field),
+    Button(Format("{done_btn}"), id="done_btn_id", on_click=process_field_done, when="edit_mode")
     )
 
 
@@ -321,10 +338,17 @@ dialog = Dialog(
             on_click=start_edit_mode,
             when=F["role"] == "student"),
 
+        Button(
+            Format("{save_btn}"),
+            id="save_btn_id",
+            on_click=process_done,
+            when="has_changes"),
+
         Start(
             Format("{back_btn}"),
             id="back_btn",
             state=Flow.MENU,
+            on_click=save_on_leave,
             show_mode=ShowMode.DELETE_AND_SEND,
             mode=StartMode.RESET_STACK
         ),
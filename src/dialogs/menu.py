@@ -1,7 +1,5 @@
 from typing import TYPE_CHECKING
 
-from glob import glob
-
 from aiogram.types import CallbackQuery
 from aiogram.fsm.storage.redis import RedisStorage
 
@@ -11,8 +9,8 @@ from aiogram_dialog.widgets.kbd import Button
 from aiogram_dialog.widgets.text import Format
 
 from ..states import Flow, PersonGallery
-from ..custom_types import Student, Teacher
-from ..google_queries import get_students, get_teachers
+from ..custom_types import RosterSnapshot, Gallery
+from ..google_queries import get_roster_snapshot, get_gallery
 from ..enums import Database, RedisKeys
 
 from ..utils.utils import get_middleware_data
@@ -52,26 +50,21 @@ async def retrive_gallery(callback: CallbackQuery, button: Button, dialog_manage
 
         case "student_gallery_btn_id":
             role = "student"
-            persons: list[Student] = await get_students(config)
 
         case "teacher_gallery_btn_id":
             role = "teacher"
-            persons: list[Teacher] = await get_teachers(config)
             
         case "my_profile_btn_id":
             
             # Check if user is in students or teachers list
             if await users_storage.redis.sismember(RedisKeys.STUDENTS, user_data.id):
                 role = "student"
-                persons: list[Student] = await get_students(config)
 
             elif await users_storage.redis.sismember(RedisKeys.TEACHERS, user_data.id):
                 role = "teacher"
-                persons: list[Teacher] = await get_teachers(config)
             else:
                 # User not found in either list, default to students
                 role = "unknown"
-                persons = []
 
     if role == "unknown":
         await bot.send_message(
@@ -84,27 +77,29 @@ async def retrive_gallery(callback: CallbackQuery, button: Button, dialog_manage
             show_mode=ShowMode.DELETE_AND_SEND)
         return
 
-    if user_data.id not in config.admins.ids:
-        persons = [p for p in persons if p.id not in config.admins.ids]
-
-    all_images: list[str] = glob("./media/*/onboarding/4_*")
+    snapshot: RosterSnapshot = await get_roster_snapshot(config)
+    hide_admins: bool = user_data.id not in config.admins.ids
 
-    for person in persons:
-        person.get_latest_image_path(all_images)
-        
+    # the dialog keeps only a reference to the shared roster, not the persons themselves
     start_data = {
         "role": role,
-        "persons": [p.model_dump() for p in persons],
+        "roster_version": snapshot.version,
+        "hide_admins": hide_admins,
         "current_user_id": user_data.id
     }
 
     if callback.data == "my_profile_btn_id":
+        gallery: Gallery = get_gallery(snapshot, role, config.admins.ids if hide_admins else [])
+        position: int | None = gallery.position(user_data.id)
+
+        if position is None:
+            # registered, but not in the roster read from the sheet (yet)
+            await callback.answer("Твой профиль пока не найден в таблице, попробуй позже", show_alert=True)
+            return
+
         state = PersonGallery.PROFILE
-        current_student_index: int = [p.id for p in persons].index(user_data.id)
-        back_student_index: int = current_student_index - 1 if current_student_index > 0 else len(persons) - 1
-        next_student_index: int = current_student_index + 1 if current_student_index < len(persons) - 1 else 0
         start_data.update({
-            "indexes": (current_student_index, back_student_index, next_student_index)
+            "indexes": gallery.indexes(position)
         })
 
     await dialog_manager.start(
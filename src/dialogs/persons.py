@@ -5,7 +5,7 @@ from aiogram import F
 from aiogram.types import CallbackQuery
 from aiogram.enums import ContentType
 
-from aiogram_dialog import Dialog, Window, DialogManager, Data
+from aiogram_dialog import Dialog, Window, DialogManager
 from aiogram_dialog.widgets.kbd import Select, Back, Row, Button, Url
 from aiogram_dialog.widgets.text import Format, Jinja, Const
 from aiogram_dialog.widgets.media import StaticMedia
@@ -13,9 +13,13 @@ from aiogram_dialog.widgets.media import StaticMedia
 from ..widgets.scrolling_group import CustomScrollingGroup
 
 from ..utils.utils import get_middleware_data
+from ..utils.photo_index import get_photo_index
+from ..utils.prefetch import get_profile_prefetcher
 
 from ..states import PersonGallery, EditMode
-from ..custom_types import Student, Teacher
+from ..custom_types import Student, Teacher, RosterSnapshot, Gallery
+from ..google_queries import get_roster_by_version, get_gallery
+from ..config import Config
 
 from aiogram.enums import ParseMode
 from fluentogram import TranslatorRunner
@@ -28,7 +32,8 @@ async def on_dialog_start(
         start_data: Any,
         dialog_manager: DialogManager):
 
-    dialog_manager.dialog_data["persons"] = start_data["persons"]
+    dialog_manager.dialog_data["roster_version"] = start_data["roster_version"]
+    dialog_manager.dialog_data["hide_admins"] = start_data.get("hide_admins", True)
     dialog_manager.dialog_data["role"] = start_data["role"]
     dialog_manager.dialog_data["current_user_id"] = start_data.get("current_user_id", 0)
     dialog_manager.dialog_data["current_person_index"] = start_data.get("indexes", (0, 0, 0))[0]
@@ -54,14 +59,33 @@ async def dialog_get_data(
     return data
 
 
-def prepare_list_of_persons(dialog_manager: DialogManager) -> list[Student | Teacher]:
+async def get_current_gallery(dialog_manager: DialogManager) -> Gallery:
+    """
+    Resolve the gallery from the shared roster store by the version kept in dialog_data.
+    """
+    _, config, _ = get_middleware_data(dialog_manager)
 
-    persons_raw: list[dict] = dialog_manager.dialog_data.get("persons", [])
+    snapshot: RosterSnapshot = await get_roster_by_version(
+        config, dialog_manager.dialog_data.get("roster_version", ""))
 
-    if persons_raw[0]["role"] == "student":
-        return [Student(**person) for person in persons_raw]
-    else:
-        return [Teacher(**person) for person in persons_raw]
+    gallery: Gallery = get_gallery(
+        snapshot, dialog_manager.dialog_data.get("role", "student"), hidden_ids(dialog_manager, config))
+
+    if snapshot.version != dialog_manager.dialog_data.get("roster_version"):
+        # the version has expired: move to the current one and keep pointing at the same person
+        dialog_manager.dialog_data["roster_version"] = snapshot.version
+        position: int | None = gallery.position(dialog_manager.dialog_data.get("current_person_id"))
+        if position is None:
+            # they left the roster: stay where the carousel was rather than jump to the first person
+            position = min(dialog_manager.dialog_data.get("current_person_index", 0), len(gallery) - 1)
+        set_indexes(dialog_manager, gallery, position)
+
+    return gallery
+
+
+def hidden_ids(dialog_manager: DialogManager, config: Config) -> list[int]:
+
+    return config.admins.ids if dialog_manager.dialog_data.get("hide_admins", True) else []
 
 
 async def get_persons(
@@ -70,12 +94,12 @@ async def get_persons(
 
     _, _, user_data = get_middleware_data(dialog_manager)
 
-    persons: list[Student | Teacher] = prepare_list_of_persons(dialog_manager)
+    gallery: Gallery = await get_current_gallery(dialog_manager)
 
-    persons_list: list[tuple[str, int]] = [
-        (f"⭐ {person.name}" if person.id == user_data.id else person.name, 
-        int(person.id)) for person in persons
-    ]
+    persons_list: list[tuple[str, int]] = list(gallery.items)
+    own_position: int | None = gallery.positions.get(user_data.id)
+    if own_position is not None:
+        persons_list[own_position] = (f"⭐ {gallery.items[own_position][0]}", user_data.id)
 
     return {'persons': persons_list}
 
@@ -96,16 +120,15 @@ async def process_persons_selection(
     item_id: str):
 
     current_person_id: int = int(item_id)
-    persons: list[Student | Teacher] = prepare_list_of_persons(dialog_manager)
-    current_person_index: int = [p.id for p in persons].index(current_person_id)
+    gallery: Gallery = await get_current_gallery(dialog_manager)
 
-    dialog_manager.dialog_data["current_person_index"] = current_person_index
-
-    dialog_manager.dialog_data["back_person_index"] = \
-        current_person_index - 1 if current_person_index > 0 else len(persons) - 1
+    position: int | None = gallery.position(current_person_id)
+    if position is None:
+        # the list was shown from a roster version this person is no longer in
+        await callback.answer("Этого профиля больше нет в списке")
+        return
 
-    dialog_manager.dialog_data["next_person_index"] = \
-        current_person_index + 1 if current_person_index < len(persons) - 1 else 0
+    set_indexes(dialog_manager, gallery, position)
 
     await dialog_manager.next()
 
@@ -114,85 +137,67 @@ async def get_data_for_profile(
     dialog_manager: DialogManager,
     **kwargs):
 
-    _, config, user_data = get_middleware_data(dialog_manager)
+    bot, config, user_data = get_middleware_data(dialog_manager)
 
-    persons: list[Student | Teacher] = prepare_list_of_persons(dialog_manager)
-
-    role = dialog_manager.dialog_data.get("role", "student")
-    
-    data = {}
+    gallery: Gallery = await get_current_gallery(dialog_manager)
 
     current_person_index, back_person_index, next_person_index = get_indexes(dialog_manager)
-    
-    current_person: Student | Teacher = persons[current_person_index]
-    
-    back_person: Student | Teacher = persons[back_person_index]
-    next_person: Student | Teacher = persons[next_person_index]
-    
-    # Add tags formatting (not included in Student class as it's optional)
-    person_tags = f"\n🏷️ #{' #'.join(current_person.tags)}" if current_person.tags else ""
 
-    data.update({
-        "person_name": (current_person.name, current_person.username),
-        "person_slogan": f"\n💡 {current_person.slogan}" if current_person.slogan else "",
-        "telegraph_page": current_person.telegraph_page,
-        "person_tags": person_tags,
-        "back_person": f"{back_person.get_display_name()}",
-        "next_person": f"{next_person.get_display_name()}"
-    })
+    current_person: Student | Teacher = gallery.persons[current_person_index]
 
-    if role == "student":
-        data.update({"person_expectations": f"\n🎯 {current_person.expectations}" if current_person.expectations else ""})
-    else:
-        data.update({"person_mission": f"\n🎯 {current_person.mission}" if current_person.mission else ""})
+    data = dict(gallery.card(current_person_index))
 
-    if current_person.image_path:
-        data.update({"person_image": 
-        current_person.image_path
-        })
+    person_image: str | None = await get_photo_index(config).latest_path(current_person.id)
+    if person_image:
+        data.update({"person_image": person_image})
 
     if current_person.id == dialog_manager.dialog_data.get("current_user_id", 0) or user_data.id in config.admins.ids:
         data.update({"edit_btn_true": True})
 
-    
-    dialog_manager.dialog_data["current_person_data"] = current_person.model_dump()
+
+    dialog_manager.dialog_data["current_person_id"] = current_person.id
+
+    # get the neighbours ready while this profile is being read
+    get_profile_prefetcher(config).schedule(
+        bot, user_data.id, gallery, (back_person_index, next_person_index))
 
     return data
 
 
-def update_indexes(
-    dialog_manager: DialogManager, 
-    callback: CallbackQuery,
-    num_persons: int):
+def set_indexes(
+    dialog_manager: DialogManager,
+    gallery: Gallery,
+    current_person_index: int):
 
-    current_person_index, _, _ = get_indexes(dialog_manager)
-    
-    match callback.data:
-        case "back_person_id":
-            current_person_index = current_person_index - 1 if current_person_index > 0 else num_persons - 1
-        case "next_person_id":
-            current_person_index = current_person_index + 1 if current_person_index < num_persons - 1 else 0
+    current_person_index, back_person_index, next_person_index = gallery.indexes(current_person_index)
 
     dialog_manager.dialog_data["current_person_index"] = current_person_index
-    dialog_manager.dialog_data["back_person_index"] = \
-        current_person_index - 1 if current_person_index > 0 else num_persons - 1
-    dialog_manager.dialog_data["next_person_index"] = \
-        current_person_index + 1 if current_person_index < num_persons - 1 else 0
+    dialog_manager.dialog_data["back_person_index"] = back_person_index
+    dialog_manager.dialog_data["next_person_index"] = next_person_index
 
 
 async def process_carousel(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
 
-    persons: list[Student | Teacher] = prepare_list_of_persons(dialog_manager)
+    gallery: Gallery = await get_current_gallery(dialog_manager)
 
-    update_indexes(dialog_manager, callback, len(persons))
+    _, back_person_index, next_person_index = get_indexes(dialog_manager)
+
+    match callback.data:
+        case "back_person_id":
+            set_indexes(dialog_manager, gallery, back_person_index)
+        case "next_person_id":
+            set_indexes(dialog_manager, gallery, next_person_index)
 
 
 async def start_edit_mode(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
 
+    gallery: Gallery = await get_current_gallery(dialog_manager)
+    current_person_index, _, _ = get_indexes(dialog_manager)
+
     await dialog_manager.start(
         state=EditMode.MAIN,
         data={
-            "current_person_data": dialog_manager.dialog_data.get("current_person_data", {}),
+            "current_person_data": gallery.persons[current_person_index].model_dump(mode="json"),
             "role": dialog_manager.dialog_data.get("role", "student"),
         }
     )
@@ -203,20 +208,6 @@ NAME_TEXT_WITH_USERNAME = Jinja("""
 """)
 
 
-async def on_process_result(
-    start_data: Data,
-    result: Any,
-    dialog_manager: DialogManager):
-
-    person: dict = result.get("person")
-    persons: list[dict] = dialog_manager.dialog_data.get("persons")
-
-    for p in persons:
-        if p.get("id") == person.get("id"):
-            p.update(person)
-            break
-
-
 dialog = Dialog(
 
     Window(
@@ -233,7 +224,7 @@ dialog = Dialog(
             ),
             width=1,
             height=5,
-            id="person_croll_list_id",do
+            id="person_croll_list_id",
             back_btn="◀️",
             forward_btn="▶️",
             back_btn_text="Назад"
@@ -271,6 +262,5 @@ dialog = Dialog(
     ),
 
     getter=dialog_get_data,
-    on_start=on_dialog_start,
-    on_process_result=on_process_result
+    on_start=on_dialog_start
 )
\ No newline at end of file
@@ -1,8 +1,17 @@
-from .utils.sheets_async import SheetsAsync
+import time
+import asyncio
+import logging
+from typing import AsyncIterator
+
+from .utils.sheets_async import SheetsAsync, get_quota_governor
+from .utils.roster_cache import RosterCache
+from .utils.sheets_outbox import SheetsOutbox, CellValue
+from .utils.redis_pool import get_redis
+from .utils.row_index import RowIndex
 
 
 from .config import Config
-from .custom_types import Teacher, Student
+from .custom_types import Teacher, Student, RosterSnapshot, Gallery
 
 from pprint import pprint
 
@@ -18,7 +27,11 @@ async def get_main_sheets_instance(config: Config, rng: str, get_instance: bool
     if _main_sheets_instance is None:
         _main_sheets_instance = SheetsAsync(
             spreadsheet_id = config.google.onboarding_id,
-            sa_json_path = config.google.service_account_json
+            sa_json_path = config.google.service_account_json,
+            governor = get_quota_governor(
+                config.sheets.read_per_minute,
+                config.sheets.write_per_minute),
+            base_url = config.sheets.base_url
         )
 
     if get_instance:
@@ -32,38 +45,570 @@ async def get_main_sheets_instance(config: Config, rng: str, get_instance: bool
     return res
 
 
-async def get_students(config: Config) -> list[Student]:
+async def close_main_sheets_instance() -> None:
+    """
+    Stop the token refresher and close the HTTP client of the students spreadsheet instance.
+    """
+    global _main_sheets_instance
+
+    if _main_sheets_instance is not None:
+        await _main_sheets_instance.close()
+        _main_sheets_instance = None
+        logging.info("Sheets client closed")
+
+
+# Default 0-based column positions of the fields we read from each tab.
+# A header title from config.google.columns overrides the position.
+STUDENT_COLUMNS: dict[str, int] = {
+    "id": 0, "name": 1, "username": 2, "slogan": 7, "prof_experience": 8,
+    "about": 9, "tags": 11, "expectations": 14, "telegraph_page": 15}
+
+TEACHER_COLUMNS: dict[str, int] = {
+    "id": 0, "name": 1, "username": 2, "about": 4, "prof_experience": 5,
+    "tags": 6, "mission": 7, "slogan": 8, "telegraph_page": 10}
+
+INTERN_COLUMNS: dict[str, int] = {"id": 0, "internship": 1}
+
+FIRST_DATA_ROW = 3  # rows 1-2 hold the headers
+
+# Only the values are needed; skips range/majorDimension echo in the response
+_VALUES_ONLY = "valueRanges(values)"
+
+
+def get_roster_tabs(config: Config) -> dict[str, tuple[str, dict[str, int]]]:
+
+    return {
+        "student": (config.google.student_vitrina_tab, STUDENT_COLUMNS),
+        "teacher": (config.google.teacher_vitrina_tab, TEACHER_COLUMNS),
+        "intern": (config.google.intern_tab, INTERN_COLUMNS),
+    }
+
+
+# Resolved once per process from the header rows
+_column_maps: dict[str, dict[str, int]] | None = None
+
+async def get_column_maps(config: Config) -> dict[str, dict[str, int]]:
+    """
+    Resolve field -> column position for every roster tab with one batchGet of the header rows.
+    """
+    global _column_maps
+    if _column_maps is not None:
+        return _column_maps
+
+    sheet: SheetsAsync = await get_main_sheets_instance(config, "", True)
+    tabs = get_roster_tabs(config)
+
+    res = await sheet.batch_get([f"{tab}!1:1" for tab, _ in tabs.values()], fields=_VALUES_ONLY)
+
+    column_maps: dict[str, dict[str, int]] = {}
+
+    for (key, (_, defaults)), value_range in zip(tabs.items(), res.get("valueRanges", [])):
+        header: list[str] = [h.strip() for h in (value_range.get("values") or [[]])[0]]
+        titles: dict[str, str] = config.google.columns.get(key, {})
+        column_maps[key] = {
+            field: header.index(titles[field]) if titles.get(field) in header else position
+            for field, position in defaults.items()
+        }
+
+    _column_maps = column_maps
+    return _column_maps
+
+
+def column_runs(columns: dict[str, int]) -> list[tuple[int, int]]:
+    """
+    Group column positions into contiguous (first, last) runs, one A1 range each.
+    """
+    runs: list[tuple[int, int]] = []
+
+    for position in sorted(set(columns.values())):
+        if runs and position == runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], position)
+        else:
+            runs.append((position, position))
+
+    return runs
+
+
+def projected_ranges(tab: str, columns: dict[str, int], first_row: int, last_row: int | None = None) -> list[str]:
+
+    end = "" if last_row is None else str(last_row)
+    return [
+        f"{tab}!{column_number_to_letter(first + 1)}{first_row}:{column_number_to_letter(last + 1)}{end}"
+        for first, last in column_runs(columns)
+    ]
+
+
+def rows_from_runs(columns: dict[str, int], run_values: list[list[list[str]]]) -> list[dict[str, str]]:
+    """
+    Stitch the values of the per-run ranges back into one {field: cell} dict per sheet row.
+    """
+    runs = column_runs(columns)
+    num_rows = max((len(values) for values in run_values), default=0)
+    rows: list[dict[str, str]] = []
+
+    for ind in range(num_rows):
+        cells: dict[int, str] = {}
+        for (first, _), values in zip(runs, run_values):
+            row = values[ind] if ind < len(values) else []
+            for offset, cell in enumerate(row):
+                cells[first + offset] = cell
+        rows.append({field: cells.get(position, "") for field, position in columns.items()})
+
+    return rows
+
+
+def build_persons(role: str, rows: list[dict[str, str]], first_row: int) -> list[Student | Teacher]:
+
+    model = Student if role == "student" else Teacher
+
+    return [
+        model(**row, row=first_row + ind)
+        for ind, row in enumerate(rows) if row.get("id", "").strip()]
+
+
+def sort_persons(role: str, persons: list[Student | Teacher]) -> list[Student | Teacher]:
+
+    # students are listed as "Имя Фамилия", teachers as "Фамилия Имя Отчество"
+    name_part = 1 if role == "student" else 0
+    return sorted(persons, key=lambda x: x.name.split()[name_part])
+
+
+async def fetch_window(
+        config: Config,
+        keys: list[str],
+        first_row: int,
+        last_row: int) -> dict[str, list[dict[str, str]]]:
+    """
+    Read rows first_row..last_row of the projected columns of several tabs in one batchGet.
+    """
+    sheet: SheetsAsync = await get_main_sheets_instance(config, "", True)
+    column_maps = await get_column_maps(config)
+    tabs = get_roster_tabs(config)
+
+    ranges: list[str] = []
+    for key in keys:
+        ranges.extend(projected_ranges(tabs[key][0], column_maps[key], first_row, last_row))
+
+    res = await sheet.batch_get(ranges, fields=_VALUES_ONLY)
+    value_ranges: list[dict] = res.get("valueRanges", [])
+
+    rows: dict[str, list[dict[str, str]]] = {}
+    for key in keys:
+        num_runs = len(column_runs(column_maps[key]))
+        rows[key] = rows_from_runs(
+            column_maps[key],
+            [vr.get("values", []) for vr in value_ranges[:num_runs]])
+        value_ranges = value_ranges[num_runs:]
+
+    return rows
+
+
+async def get_tab_row_counts(config: Config, keys: list[str]) -> dict[str, int]:
+    """
+    Grid size (rows, including blank ones) of the roster tabs, from one metadata request.
+    """
+    sheet: SheetsAsync = await get_main_sheets_instance(config, "", True)
+    tabs = get_roster_tabs(config)
+
+    meta = await sheet.get_spreadsheet(fields="sheets.properties(title,gridProperties.rowCount)")
+    counts: dict[str, int] = {
+        s["properties"]["title"]: s["properties"].get("gridProperties", {}).get("rowCount", 0)
+        for s in meta.get("sheets", [])}
+
+    return {key: counts[tabs[key][0]] for key in keys if tabs[key][0] in counts}
+
+
+async def iter_row_windows(
+        config: Config,
+        keys: list[str]) -> AsyncIterator[tuple[str, int, list[dict[str, str]]]]:
+    """
+    Yield (tab key, first sheet row, rows) window by window, in row order within each tab.
+
+    The first window of every tab comes in one batchGet, fetched together
+    with the tabs' grid sizes, so tabs that fit in `config.sheets.chunk_rows`
+    cost a single round trip. Larger tabs continue with
+    `config.sheets.parallel_chunks` windows fetched concurrently up to the
+    last grid row. Sheets leaves trailing blank rows out of each window, so a
+    short window says nothing about the rows after it; only a tab missing
+    from the metadata falls back to stopping at the first empty window.
+    """
+    chunk_rows: int = config.sheets.chunk_rows
+    parallel: int = config.sheets.parallel_chunks
+
+    window, row_counts = await asyncio.gather(
+        fetch_window(config, keys, FIRST_DATA_ROW, FIRST_DATA_ROW + chunk_rows - 1),
+        get_tab_row_counts(config, keys))
+
+    next_row = FIRST_DATA_ROW + chunk_rows
+
+    def has_more(key: str, rows: list[dict[str, str]], end: int) -> bool:
+        if key in row_counts:
+            return row_counts[key] > end
+        return bool(rows)
+
+    open_keys: list[str] = []
+    for key in keys:
+        yield key, FIRST_DATA_ROW, window[key]
+        if has_more(key, window[key], next_row - 1):
+            open_keys.append(key)
+
+    while open_keys:
+        last_row = max(row_counts.get(key, 0) for key in open_keys)
+        starts = [next_row + i * chunk_rows for i in range(parallel)]
+        if all(key in row_counts for key in open_keys):
+            starts = [start for start in starts if start <= last_row]
+
+        tasks = [
+            asyncio.create_task(fetch_window(config, list(open_keys), start, start + chunk_rows - 1))
+            for start in starts]
+
+        try:
+            for start, task in zip(starts, tasks):
+                window = await task
+                for key in [k for k in window if k in open_keys]:
+                    yield key, start, window[key]
+                    if not has_more(key, window[key], start + chunk_rows - 1):
+                        open_keys.remove(key)
+                if not open_keys:
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+
+        next_row = starts[-1] + chunk_rows
+
+
+async def stream_persons(config: Config, role: str) -> AsyncIterator[Student | Teacher]:
+    """
+    Yield parsed students or teachers in sheet order as their row windows arrive.
+    """
+    async for _, first_row, rows in iter_row_windows(config, [role]):
+        for person in build_persons(role, rows, first_row):
+            yield person
+
+
+async def load_roster_snapshot(config: Config) -> RosterSnapshot:
+    """
+    Read only the needed columns of the student, teacher and intern tabs,
+    parsing window by window so a large tab never arrives as one payload.
+    """
+    students: list[Student] = []
+    teachers: list[Teacher] = []
+    internships: dict[str, str] = {}
+
+    async for key, first_row, rows in iter_row_windows(config, list(get_roster_tabs(config))):
+        match key:
+            case "student":
+                students.extend(build_persons("student", rows, first_row))
+            case "teacher":
+                teachers.extend(build_persons("teacher", rows, first_row))
+            case "intern":
+                internships.update({
+                    row["id"].strip(): row["internship"] for row in rows if row.get("id", "").strip()})
+
+    for student in students:
+        student.internship = internships.get(str(student.id)) or None
+
+    return RosterSnapshot.create(
+        students=sort_persons("student", students),
+        teachers=sort_persons("teacher", teachers))
+
+
+_roster_cache: RosterCache[RosterSnapshot] | None = None
+
+ROSTER_KEY = "snapshot"
+
+def get_roster_cache(config: Config) -> RosterCache[RosterSnapshot]:
+    """
+    Get or create a singleton cache holding the current roster snapshot.
+    """
+    global _roster_cache
+    if _roster_cache is None:
+
+        async def loader(key: str) -> RosterSnapshot:
+            snapshot = await load_roster_snapshot(config)
+            await seed_row_indexes(config, snapshot)
+            await store_snapshot_version(config, snapshot)
+            return snapshot
+
+        _roster_cache = RosterCache(
+            loader,
+            RosterSnapshot,
+            ttl=config.cache.roster_ttl,
+            stale_ttl=config.cache.roster_stale_ttl,
+            redis=get_redis(config.redis.temp),
+        )
+
+    return _roster_cache
+
+
+# Recent snapshots by version, so open galleries keep resolving the roster they started with
+_snapshots: dict[str, RosterSnapshot] = {}
+_SNAPSHOTS_KEPT = 5
+
+
+def remember_snapshot(snapshot: RosterSnapshot) -> None:
+
+    _snapshots.pop(snapshot.version, None)
+    _snapshots[snapshot.version] = snapshot
+    while len(_snapshots) > _SNAPSHOTS_KEPT:
+        del _snapshots[next(iter(_snapshots))]
+
+
+ROSTER_VERSIONS_KEY = "roster_versions"
+
+
+async def store_snapshot_version(config: Config, snapshot: RosterSnapshot) -> None:
+    """
+    Keep a copy of a snapshot under its version in Redis for dialogs opened in another process or before a restart.
+
+    Versions are listed in a sorted set by the time they were last stored;
+    only the newest `cache.roster_versions_kept` copies are kept.
+    """
+    redis = get_redis(config.redis.temp)
+    kept = config.cache.roster_versions_kept
+
+    try:
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.set(
+                f"roster_version:{snapshot.version}",
+                snapshot.model_dump_json(),
+                ex=config.cache.roster_version_ttl)
+            pipe.zadd(ROSTER_VERSIONS_KEY, {snapshot.version: time.time()})
+            pipe.zrange(ROSTER_VERSIONS_KEY, 0, -kept - 1)
+            *_, outdated = await pipe.execute()
+
+        if outdated:
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(*(f"roster_version:{version.decode()}" for version in outdated))
+                pipe.zrem(ROSTER_VERSIONS_KEY, *outdated)
+                await pipe.execute()
+
+    except Exception as e:
+        logging.warning(f"Can't store roster version {snapshot.version}: {e}")
+
+
+async def get_roster_snapshot(config: Config) -> RosterSnapshot:
     """
-    Get list of students from Google Sheets.
+    Get the current roster snapshot from the cache.
     """
-    res: list[list[str]] = await get_main_sheets_instance(config, f"{config.google.student_vitrina_tab}!A1:P")
+    snapshot: RosterSnapshot = await get_roster_cache(config).get(ROSTER_KEY)
+    if _snapshots.get(snapshot.version) is not snapshot:
+        remember_snapshot(snapshot)
 
-    students: list[Student] = [
-        Student(
-            id=col[0], name=col[1], username=col[2], 
-            slogan=col[7], prof_experience=col[8], 
-            about=col[9], tags=col[11], expectations=col[14],
-            telegraph_page=col[15], row=ind+3)
-        for ind, col in enumerate(res)]
+    return snapshot
 
-    return sorted(students, key=lambda x: x.name.split()[1])
+
+async def get_roster_by_version(config: Config, version: str) -> RosterSnapshot:
+    """
+    Resolve a snapshot by version; falls back to the current one if the version has expired.
+    """
+    snapshot = _snapshots.get(version)
+    if snapshot is not None:
+        return snapshot
+
+    try:
+        raw = await get_redis(config.redis.temp).get(f"roster_version:{version}")
+    except Exception as e:
+        logging.warning(f"Can't read roster version {version}: {e}")
+        raw = None
+
+    if raw:
+        snapshot = RosterSnapshot.model_validate_json(raw)
+        remember_snapshot(snapshot)
+        return snapshot
+
+    logging.warning(f"Roster version {version} expired, using the current one")
+    return await get_roster_snapshot(config)
+
+
+# Gallery views by (version, role, hidden ids); built once per snapshot, dropped with it
+_galleries: dict[tuple[str, str, tuple[int, ...]], Gallery] = {}
+
+
+def get_gallery(snapshot: RosterSnapshot, role: str, hidden_ids: list[int]) -> Gallery:
+    """
+    Persons of a role as shown in the gallery: snapshot order, without hidden ids (admins).
+    """
+    key = (snapshot.version, role, tuple(sorted(hidden_ids)))
+
+    gallery = _galleries.get(key)
+    if gallery is None:
+        persons = snapshot.students if role == "student" else snapshot.teachers
+        hidden = set(hidden_ids)
+        gallery = Gallery(snapshot.version, [p for p in persons if p.id not in hidden])
+
+        for k in [k for k in _galleries if k[0] not in _snapshots]:
+            del _galleries[k]
+        _galleries[key] = gallery
+
+    return gallery
+
+
+async def get_students(config: Config) -> list[Student]:
+    """
+    Get sorted list of students, served from the roster cache.
+    """
+    snapshot: RosterSnapshot = await get_roster_snapshot(config)
+    return list(snapshot.students)
 
 
 async def get_teachers(config: Config) -> list[Teacher]:
     """
-    Get list of teachers from Google Sheets.
+    Get sorted list of teachers, served from the roster cache.
     """
-    res: list[list[str]] = await get_main_sheets_instance(config, f"{config.google.teacher_vitrina_tab}!A1:K")
+    snapshot: RosterSnapshot = await get_roster_snapshot(config)
+    return list(snapshot.teachers)
 
-    teachers: list[Teacher] = [
-        Teacher(
-            id=col[0], name=col[1], username=col[2],
-            about=col[4], prof_experience=col[5],
-            tags=col[6], mission=col[7], slogan=col[8],
-            telegraph_page=col[10], row=ind+3)
-        for ind, col in enumerate(res) if len(col) > 3]
 
-    return sorted(teachers, key=lambda x: x.name.split()[0])
+async def invalidate_roster(config: Config) -> None:
+    """
+    Drop the cached roster snapshot after the sheet has changed.
+    """
+    await get_roster_cache(config).invalidate(ROSTER_KEY)
+
+
+async def update_roster_person(config: Config, role: str, person: dict) -> None:
+    """
+    Apply an edited person to the cached roster before the sheet write lands.
+    """
+    def mutate(snapshot: RosterSnapshot) -> None:
+        persons = snapshot.students if role == "student" else snapshot.teachers
+        for ind, p in enumerate(persons):
+            if p.id == person.get("id"):
+                persons[ind] = p.model_validate({**p.model_dump(), **person})
+                break
+
+    await get_roster_cache(config).patch(ROSTER_KEY, mutate)
+
+    # galleries hold a version, not the cache entry, so patch those copies too
+    for snapshot in list(_snapshots.values()):
+        mutate(snapshot)
+        await store_snapshot_version(config, snapshot)
+
+    # the gallery views reference the replaced person objects
+    _galleries.clear()
+
+
+_row_indexes: dict[str, RowIndex] = {}
+
+async def get_row_index(config: Config, role: str) -> RowIndex:
+    """
+    Get or create the id -> row index of a vitrina tab ("student" / "teacher").
+    """
+    index = _row_indexes.get(role)
+    if index is None:
+        column_maps = await get_column_maps(config)
+        index = RowIndex(
+            sheet=await get_main_sheets_instance(config, "", True),
+            tab=get_vitrina_tab(config, role),
+            id_column=column_number_to_letter(column_maps[role]["id"] + 1),
+            first_row=FIRST_DATA_ROW,
+        )
+        _row_indexes[role] = index
+
+    return index
+
+
+async def seed_row_indexes(config: Config, snapshot: RosterSnapshot) -> None:
+    """
+    Every snapshot read already tells where each person sits; reuse it for the row indexes.
+    """
+    for role, persons in (("student", snapshot.students), ("teacher", snapshot.teachers)):
+        index: RowIndex = await get_row_index(config, role)
+        index.seed({p.id: p.row for p in persons})
+
+
+_sheets_outbox: SheetsOutbox | None = None
+
+async def get_sheets_outbox(config: Config) -> SheetsOutbox:
+    """
+    Get or create a singleton write-behind outbox for the main spreadsheet.
+    """
+    global _sheets_outbox
+    if _sheets_outbox is None:
+
+        async def on_flush(cells: list[str]) -> None:
+            # the sheet now holds the edits, let the next read pick them up
+            get_roster_cache(config).expire()
+
+        async def resolve(cells: list[str]) -> dict[str, str | None]:
+            return await resolve_person_cells(config, cells)
+
+        _sheets_outbox = SheetsOutbox(
+            sheet=await get_main_sheets_instance(config, "", True),
+            redis=get_redis(config.redis.temp),
+            flush_interval=config.sheets.outbox_flush_interval,
+            on_flush=on_flush,
+            resolve=resolve,
+        )
+
+    return _sheets_outbox
+
+
+def get_vitrina_tab(config: Config, role: str) -> str:
+
+    if role == "student":
+        return config.google.student_vitrina_tab
+    else:
+        return config.google.teacher_vitrina_tab
+
+
+def person_cell(tab: str, column: int, person_id: int) -> str:
+    """
+    Outbox key for a person's cell, e.g. "Students!H@123456"; the row is looked up at write time.
+    """
+    return f"{tab}!{column_number_to_letter(column)}@{person_id}"
+
+
+async def resolve_person_cells(config: Config, cells: list[str]) -> dict[str, str | None]:
+    """
+    Map person cell keys to verified A1 ranges; plain A1 keys are passed through.
+    """
+    roles = {get_vitrina_tab(config, role): role for role in ("student", "teacher")}
+    wanted: dict[str, set[int]] = {}
+
+    for cell in cells:
+        if "@" in cell:
+            tab = cell.split("!")[0]
+            wanted.setdefault(tab, set()).add(int(cell.split("@")[1]))
+
+    rows: dict[str, dict[int, int | None]] = {}
+    for tab, ids in wanted.items():
+        index: RowIndex = await get_row_index(config, roles[tab])
+        rows[tab] = await index.resolve(ids)
+
+    resolved: dict[str, str | None] = {}
+    for cell in cells:
+        if "@" not in cell:
+            resolved[cell] = cell
+            continue
+        address, person_id = cell.split("@")
+        row = rows[address.split("!")[0]].get(int(person_id))
+        resolved[cell] = f"{address}{row}" if row else None
+
+    return resolved
+
+
+async def enqueue_person_update(
+        config: Config,
+        role: str,
+        person_id: int,
+        fields: dict[str, CellValue]):
+    """
+    Queue several edited fields of one person as a single atomic outbox write,
+    so they reach the sheet together in one values:batchUpdate. Columns come
+    from the same header-resolved maps the roster is read with.
+    """
+    if not fields:
+        return
+
+    columns: dict[str, int] = (await get_column_maps(config))[role]
+    tab = get_vitrina_tab(config, role)
+
+    outbox: SheetsOutbox = await get_sheets_outbox(config)
+    await outbox.enqueue({
+        person_cell(tab, columns[field] + 1, person_id): value for field, value in fields.items()})
 
 
 # # Teachers spreadsheet operations
@@ -168,10 +713,7 @@ async def update_cell_by_coordinates(
         await update_cell_by_coordinates(config, "123456789", 27, 1, 3.14)
     """
 
-    if role == "student":
-        sheet_name = config.google.student_vitrina_tab
-    else:
-        sheet_name = config.google.teacher_vitrina_tab
+    sheet_name = get_vitrina_tab(config, role)
 
     sheet: SheetsAsync = await get_main_sheets_instance(config, sheet_name, True)
     
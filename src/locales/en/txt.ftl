@@ -63,4 +63,5 @@ edit-edit_about_btn =
 edit-edit_tags_btn = 
 edit-edit_expectations_btn = 
 edit-edit_mission_btn = 
+edit-save_btn = 
 
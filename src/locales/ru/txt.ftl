@@ -87,4 +87,5 @@ edit-edit_about_btn = 📍 о себе
 edit-edit_tags_btn = 🏷️ интересы
 edit-edit_expectations_btn = 🎯 ожидания
 edit-edit_mission_btn = 🚀 миссия
+edit-save_btn = 💾 Сохранить
 
@@ -151,3 +151,5 @@ class Edit:
     def edit_expectations_btn() -> Literal["""🎯 ожидания"""]: ...
     @staticmethod
     def edit_mission_btn() -> Literal["""🚀 миссия"""]: ...
+    @staticmethod
+    def save_btn() -> Literal["""💾 Сохранить"""]: ...
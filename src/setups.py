@@ -1,5 +1,7 @@
 from aiogram import Bot, Dispatcher, Router
 import os
+import asyncio
+import logging
 
 from aiogram.enums import ParseMode
 from aiogram.types import BotCommand
@@ -16,6 +18,18 @@ from src.dialogs.persons import dialog as persons_dialog
 from src.dialogs.edit_mode import dialog as edit_mode_dialog
 
 from src.config import Config
+from src.google_queries import get_sheets_outbox, close_main_sheets_instance
+from src.telegraph_queries import stop_telegraph_regeneration
+from src.utils.photo_index import get_photo_index
+from src.utils.media_queue import get_media_queue
+from src.utils.media_id_storage import get_media_id_storage
+from src.utils.prefetch import get_profile_prefetcher
+from src.utils.derivatives import shutdown_derivative_pool
+from src.utils.face_pool import get_face_analyzer
+from src.utils.face_handlers import LOCAL_FACE_RECOGNITION
+from src.utils.face_client import face_service_url, close_face_client
+from src.utils.telegraph_async import close_telegraph_client
+from src.utils.telegraph_queue import close_telegraph_queue
 
 from src.middlewares.redis_storage import RedisStorageMiddleware
 from src.middlewares.i18n import TranslatorRunnerMiddleware
@@ -35,6 +49,55 @@ router.include_routers(
     edit_mode_dialog
 )
 
+# Long-running workers started with the dispatcher
+_background_tasks: list[asyncio.Task] = []
+
+
+async def on_startup(config: Config, bot: Bot) -> None:
+
+    outbox = await get_sheets_outbox(config)
+    _background_tasks.append(asyncio.create_task(outbox.run()))
+
+    photo_index = get_photo_index(config)
+    await photo_index.load()
+    photo_index.start_watching()
+
+    await get_media_queue(config).start(bot)
+
+    if LOCAL_FACE_RECOGNITION and face_service_url() is None:
+        await get_face_analyzer(config).start()
+
+
+async def on_shutdown(config: Config) -> None:
+
+    await get_media_queue(config).close()
+    get_photo_index(config).stop_watching()
+    await get_profile_prefetcher(config).close()
+    shutdown_derivative_pool()
+    get_face_analyzer(config).close()
+    await close_face_client()
+    await stop_telegraph_regeneration()
+    await close_telegraph_queue(timeout=config.telegraph.timeout)
+    await close_telegraph_client()
+    logging.info(f"Media id cache: {get_media_id_storage(config).stats()}, "
+                 f"prefetch: {get_profile_prefetcher(config).stats()}, "
+                 f"media ingestion: {get_media_queue(config).stats()}")
+
+    for task in _background_tasks:
+        task.cancel()
+    await asyncio.gather(*_background_tasks, return_exceptions=True)
+    _background_tasks.clear()
+
+    # last chance to push queued edits; whatever fails stays in Redis for the next start
+    try:
+        outbox = await get_sheets_outbox(config)
+        await outbox.flush()
+    except Exception as e:
+        logging.error(f"Can't flush Sheets outbox on shutdown: {e}")
+
+    await close_main_sheets_instance()
+
+
 async def setup_bot(config: Config) -> Bot:
 
     bot: Bot = Bot(
@@ -83,5 +146,8 @@ async def setup_dispathcer(config: Config) -> Dispatcher:
 
     dp.include_router(router)
 
-    setup_dialogs(dp)
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
+
+    setup_dialogs(dp, media_id_storage=get_media_id_storage(config))
     return dp
\ No newline at end of file
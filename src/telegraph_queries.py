@@ -1,35 +1,208 @@
+import json
+import uuid
+import asyncio
+import hashlib
 import logging
+from typing import Callable
 
-from telegraph import Telegraph
+from my_tools import get_datetime_now
 
-from .custom_types import Teacher, Student
+from .custom_types import Teacher, Student, TelegraphPage, RosterSnapshot
 
 from .config import Config
+from .google_queries import load_roster_snapshot
+from .utils.redis_pool import get_redis
+from .utils.telegraph_queue import get_telegraph_queue
 
 
+def render_page_html(person: Student | Teacher) -> str:
+
+    return f"""
+            <p><b>📍 О себе</b></p>
+            <p>{person.about}</p>
+            <br>
+            <p><b>💼 Профессиональный опыт</b></p>
+            <p>{person.prof_experience}</p>
+        """
 
-def update_telegraph_page(config: Config, person: dict, role: str):
 
+def render_page(config: Config, person: dict, role: str) -> TelegraphPage:
 
     if role == "student":
         person = Student(**person)
     else:
         person = Teacher(**person)
 
-    telegraph = Telegraph(access_token=config.telegraph.access_token)
-
-    request = telegraph.edit_page(
+    return TelegraphPage(
         path=person.telegraph_page.split("/")[-1],
         title=person.name,
+        html_content=render_page_html(person),
         author_name=config.bot.name,
-        author_url=str(config.bot.link),
-        html_content=f"""
-            <p><b>📍 О себе</b></p>
-            <p>{person.about}</p>
-            <br>
-            <p><b>💼 Профессиональный опыт</b></p>
-            <p>{person.prof_experience}</p>
-        """
-        )
+        author_url=str(config.bot.link))
+
+
+def schedule_telegraph_update(config: Config, person: dict, role: str) -> None:
+    """
+    Queue a person's page for publishing once their edits settle down.
+    """
+    get_telegraph_queue(config).submit(render_page(config, person, role))
+
+
+REGEN_STATUS_KEY = "telegraph_regen"
+REGEN_DONE_KEY = "telegraph_regen:done"
+REGEN_LOCK_KEY = "telegraph_regen:lock"
+
+# The lock holds a per-run token; only its owner may extend or release it
+_EXTEND_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('expire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+# Admin-started regeneration; referenced so it is not garbage-collected mid-run
+_regen_tasks: set[asyncio.Task] = set()
+
+
+def render_all_pages(config: Config, snapshot: RosterSnapshot) -> list[TelegraphPage]:
+    """
+    Pages of every student and teacher that has one, in roster order.
+    """
+    pages: list[TelegraphPage] = []
+
+    for role, persons in (("student", snapshot.students), ("teacher", snapshot.teachers)):
+        for person in persons:
+            if str(person.telegraph_page).split("/")[-1]:
+                pages.append(render_page(config, person.model_dump(mode="json"), role))
+
+    return pages
+
+
+async def get_regeneration_status(config: Config) -> dict[str, str]:
+
+    raw: dict[bytes, bytes] = await get_redis(config.redis.temp).hgetall(REGEN_STATUS_KEY)
+    return {key.decode(): value.decode() for key, value in raw.items()}
+
+
+async def regeneration_running(config: Config) -> bool:
+    # the lock, not the status, so a run killed mid-way does not look alive forever
+    return bool(await get_redis(config.redis.temp).exists(REGEN_LOCK_KEY))
+
+
+async def regenerate_telegraph_pages(
+        config: Config,
+        *,
+        force: bool = False,
+        restart: bool = False,
+        on_progress: Callable[[dict[str, str]], None] | None = None) -> dict[str, str] | None:
+    """
+    Re-publish the Telegraph page of everyone in the roster.
+
+    The roster is read once from Sheets and all pages are rendered up front;
+    `telegraph.bulk_concurrency` workers publish them through the shared
+    client, so its rate limit applies. Pages whose content is already live
+    are skipped unless `force`. Finished paths are checkpointed in Redis: a
+    run over the same pages that was interrupted resumes where it stopped,
+    redoing only pages whose content changed since they were checkpointed.
+    Returns the final status, None when another run holds the lock.
+    """
+    redis = get_redis(config.redis.temp)
+    token = uuid.uuid4().hex
+
+    if not await redis.set(REGEN_LOCK_KEY, token, nx=True, ex=config.telegraph.bulk_lock_ttl):
+        logging.warning("Telegraph regeneration is already running")
+        return None
+
+    try:
+        pages = render_all_pages(config, await load_roster_snapshot(config))
+
+        # same mode and set of pages -> same run; edited pages are caught by their hash below
+        run = hashlib.sha1(json.dumps([force, sorted(p.path for p in pages)]).encode()).hexdigest()[:12]
+
+        status = await get_regeneration_status(config)
+        if restart or status.get("run") != run or status.get("state") == "done":
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.delete(REGEN_STATUS_KEY, REGEN_DONE_KEY)
+                pipe.hset(REGEN_STATUS_KEY, mapping={
+                    "run": run, "total": len(pages), "published": 0, "unchanged": 0, "failed": 0,
+                    "started": get_datetime_now(), "state": "running"})
+                await pipe.execute()
+        else:
+            await redis.hset(REGEN_STATUS_KEY, mapping={"failed": 0, "state": "running"})
+            logging.info(f"Resuming Telegraph regeneration {run}")
+
+        # path -> content hash the page had when it was done
+        done: dict[bytes, bytes] = await redis.hgetall(REGEN_DONE_KEY)
+        todo = asyncio.Queue()
+        for page in pages:
+            if done.get(page.path.encode(), b"").decode() != page.content_hash:
+                todo.put_nowait(page)
+
+        queue = get_telegraph_queue(config)
+
+        async def worker() -> None:
+
+            while not todo.empty():
+                page: TelegraphPage = todo.get_nowait()
+                try:
+                    outcome = "published" if await queue.publish(page, force=force) else "unchanged"
+                except Exception as e:
+                    logging.error(f"Can't regenerate Telegraph page {page.path}: {e!r}")
+                    outcome = "failed"
+
+                async with redis.pipeline(transaction=True) as pipe:
+                    if outcome != "failed":
+                        pipe.hset(REGEN_DONE_KEY, page.path, page.content_hash)
+                    pipe.hincrby(REGEN_STATUS_KEY, outcome, 1)
+                    pipe.eval(_EXTEND_LOCK, 1, REGEN_LOCK_KEY, token, config.telegraph.bulk_lock_ttl)
+                    await pipe.execute()
+
+                if on_progress is not None:
+                    on_progress(await get_regeneration_status(config))
+
+        await asyncio.gather(*(worker() for _ in range(config.telegraph.bulk_concurrency)))
+
+        status = await get_regeneration_status(config)
+        # with failures the checkpoint stays, so the next run retries only those pages
+        await redis.hset(REGEN_STATUS_KEY, mapping={
+            "state": "failed" if int(status["failed"]) else "done", "finished": get_datetime_now()})
+
+    except asyncio.CancelledError:
+        await redis.hset(REGEN_STATUS_KEY, "state", "interrupted")
+        raise
+
+    finally:
+        # the lock may have expired and been taken by another run meanwhile
+        await redis.eval(_RELEASE_LOCK, 1, REGEN_LOCK_KEY, token)
+
+    status = await get_regeneration_status(config)
+    logging.info(f"Telegraph regeneration finished: {status}")
+    return status
+
+
+def start_telegraph_regeneration(config: Config, force: bool = False) -> None:
+    """
+    Run regenerate_telegraph_pages in the background (admin panel).
+    """
+    async def run() -> None:
+        try:
+            await regenerate_telegraph_pages(config, force=force)
+        except Exception as e:
+            logging.error(f"Telegraph regeneration failed: {e!r}")
+
+    task = asyncio.create_task(run())
+    _regen_tasks.add(task)
+    task.add_done_callback(_regen_tasks.discard)
+
+
+async def stop_telegraph_regeneration() -> None:
 
-    logging.info(f"Telegraph page updated for {person.name}")
\ No newline at end of file
+    for task in _regen_tasks:
+        task.cancel()
+    await asyncio.gather(*_regen_tasks, return_exceptions=True)
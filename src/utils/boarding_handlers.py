@@ -5,7 +5,8 @@ import logging
 import asyncio
 import aiofiles
 
-from aiogram.types import CallbackQuery, Message
+from aiogram import Bot
+from aiogram.types import CallbackQuery, Message, PhotoSize
 from aiogram.enums import ContentType
 from aiogram.fsm.storage.redis import RedisStorage
 
@@ -20,7 +21,10 @@ from my_tools import get_datetime_now, DateTimeKeys
 from ..enums import RedisKeys, Database
 from ..states import Onboarding
 from .utils import get_middleware_data, determine_russian_name_gender
-from .face_handlers import analyze_face_in_image
+from .face_handlers import analyze_face_in_image, analyze_faces_batch
+from .face_client import get_face_client
+from .media_queue import get_media_queue
+from ..config import Config
 from ..queries import add_action
 
 from my_tools import get_datetime_now, DateTimeKeys
@@ -109,7 +113,8 @@ async def correct_name_handler(
         await dialog_manager.next()
 
     else:
-        dialog_manager.dialog_data["person"]["name"] = text
+        # applied to the person only when the field is confirmed with Done
+        dialog_manager.dialog_data.setdefault("staged", {})["name"] = text
         dialog_manager.dialog_data["edit_mode"] = True
 
 
@@ -191,7 +196,7 @@ def create_photo_input(input_id: int) -> MessageInput:
 # Хэндлер, который сработает, если пользователь отправил вообще не текст
 async def handle_voice_and_video_note(message: Message, widget: MessageInput, dialog_manager: DialogManager):
 
-    bot, _, user_data = get_middleware_data(dialog_manager)
+    _, config, user_data = get_middleware_data(dialog_manager)
     await add_action(dialog_manager)
 
     date: str = get_datetime_now(DateTimeKeys.DEFAULT)
@@ -204,10 +209,11 @@ async def handle_voice_and_video_note(message: Message, widget: MessageInput, di
 
     if message.voice:
         if message.voice.file_size <= MAX_BYTES:
-            await bot.download(
-                file=message.voice.file_id, 
-                destination=f"media/{user_data.id}/onboarding/{widget_id}_voice_{date}.ogg"
-                )
+            await get_media_queue(config).enqueue(
+                kind="voice",
+                user_id=user_data.id,
+                file_id=message.voice.file_id,
+                destination=f"media/{user_data.id}/onboarding/{widget_id}_voice_{date}.ogg")
             await dialog_manager.next()
 
         else:
@@ -217,10 +223,11 @@ async def handle_voice_and_video_note(message: Message, widget: MessageInput, di
 
     elif message.video_note:
         if message.video_note.file_size <= MAX_BYTES:
-            await bot.download(
-                file=message.video_note.file_id, 
-                destination=f"media/{user_data.id}/onboarding/{widget_id}_video_note_{date}.mp4"
-                )
+            await get_media_queue(config).enqueue(
+                kind="video_note",
+                user_id=user_data.id,
+                file_id=message.video_note.file_id,
+                destination=f"media/{user_data.id}/onboarding/{widget_id}_video_note_{date}.mp4")
             await dialog_manager.next()
         
         else:
@@ -249,14 +256,19 @@ async def photo_getter(
 async def download_photo(
     message: Message,
     dialog_manager: DialogManager) -> None:
-
-    bot, _, user_data = get_middleware_data(dialog_manager)
+    """
+    Queue the download of a profile photo; indexing and variants follow once it is on disk.
+    """
+    _, config, user_data = get_middleware_data(dialog_manager)
 
     dialog_manager.dialog_data["photo"] = True
 
     date: str = get_datetime_now(DateTimeKeys.DEFAULT)
-    await bot.download(
-        file=message.photo[-1].file_id, 
+    await get_media_queue(config).enqueue(
+        kind="photo",
+        user_id=user_data.id,
+        file_id=message.photo[-1].file_id,
+        file_unique_id=message.photo[-1].file_unique_id,
         destination=f"media/{user_data.id}/onboarding/4_profile_{date}.jpg")
 
 
@@ -272,7 +284,7 @@ async def confirm_photo_handler(
     await download_photo(callback.message, dialog_manager)
     await add_action(dialog_manager)
     
-    await callback.answer("✅ Фотография успешно загружена")
+    await callback.answer("✅ Фотография получена, скоро она появится в профиле")
     await asyncio.sleep(1)
     await dialog_manager.switch_to(Onboarding.STEP_1)
 
@@ -302,18 +314,68 @@ async def handle_photo(
 
     await download_photo(message, dialog_manager)
 
-    await message.answer(text='✅ Фотография успешно загружена')
+    await message.answer(text='✅ Фотография получена, скоро она появится в профиле')
     await asyncio.sleep(1)
 
     await dialog_manager.switch_to(Onboarding.STEP_1)
 
 
+async def select_profile_photo(
+    bot: Bot,
+    config: Config,
+    user_id: int,
+    candidates: list[PhotoSize]) -> PhotoSize | None:
+    """
+    Best suitable photo among the candidates (largest face ratio).
+
+    With the face service, all candidates go in one batch request. Locally,
+    up to face.profile_concurrency photos are analysed at once; as soon as one
+    has a face ratio of face.clear_winner_ratio or more it is taken and the
+    rest are cancelled. Verdicts are cached by file_unique_id, so retries
+    cost no downloads or detection.
+    """
+    if get_face_client(config) is not None:
+        results = await analyze_faces_batch(bot, candidates, user_id, config)
+        ratios = [(face_ratio if success else None) or 0 for success, _, face_ratio in results]
+        best = max(range(len(candidates)), key=ratios.__getitem__, default=None)
+        return candidates[best] if best is not None and ratios[best] > 0 else None
+
+    semaphore = asyncio.Semaphore(config.face.profile_concurrency)
+
+    async def analyze(photo: PhotoSize) -> tuple[PhotoSize, float | None]:
+        async with semaphore:
+            success, _, face_ratio = await analyze_face_in_image(
+                bot, photo.file_id, user_id, config, photo.file_unique_id)
+        return photo, face_ratio if success else None
+
+    tasks = [asyncio.create_task(analyze(photo)) for photo in candidates]
+
+    best_photo: PhotoSize | None = None
+    best_face_ratio: float = 0
+
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            photo, face_ratio = await next_done
+
+            if face_ratio and face_ratio > best_face_ratio:
+                best_face_ratio = face_ratio
+                best_photo = photo
+
+            if best_face_ratio >= config.face.clear_winner_ratio:
+                break
+    finally:
+        for task in tasks:
+            task.cancel()
+
+    return best_photo
+
+
 async def handle_profile(
     callback: CallbackQuery, 
     button: Button, 
     dialog_manager: DialogManager):
 
-    bot, _, user_data = get_middleware_data(dialog_manager)
+    bot, config, user_data = get_middleware_data(dialog_manager)
 
     # Получаем фотографии профиля
     photos = await bot.get_user_profile_photos(user_id=user_data.id)
@@ -322,16 +384,7 @@ async def handle_profile(
         await dialog_manager.switch_to(Onboarding.NO_PHOTO)
         return
 
-    best_photo = None
-    best_face_ratio = 0
-
-    # Перебираем все фотографии профиля для поиска лучшей
-    for photo in photos.photos:
-        success, _, face_ratio = await analyze_face_in_image(bot, photo[-1].file_id, user_data.id)
-        
-        if success and face_ratio and face_ratio > best_face_ratio:
-            best_face_ratio = face_ratio
-            best_photo = photo[-1]
+    best_photo = await select_profile_photo(bot, config, user_data.id, [photo[-1] for photo in photos.photos])
 
     if best_photo is None:
         # Если не найдено подходящее фото, переходим к загрузке нового
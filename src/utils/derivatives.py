@@ -0,0 +1,152 @@
+import os
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import NamedTuple
+
+from PIL import Image, ImageOps
+
+from ..config import Config
+from ..custom_types import FaceBox
+
+
+# side of the avatar square relative to the larger side of the face box
+AVATAR_FACE_SCALE = 2.2
+
+
+class DerivativePaths(NamedTuple):
+
+    gallery: str
+    thumb: str
+    avatar: str
+
+
+def derivative_paths(source: str) -> DerivativePaths:
+    """
+    Variant paths of a "media/<user id>/onboarding/<name>.jpg" photo:
+    "media/<user id>/gallery/<name>_{gallery,thumb,avatar}.jpg".
+    """
+    user_dir = os.path.dirname(os.path.dirname(source))
+    stem = os.path.splitext(os.path.basename(source))[0]
+    gallery_dir = os.path.join(user_dir, "gallery")
+
+    return DerivativePaths(
+        gallery=os.path.join(gallery_dir, f"{stem}_gallery.jpg"),
+        thumb=os.path.join(gallery_dir, f"{stem}_thumb.jpg"),
+        avatar=os.path.join(gallery_dir, f"{stem}_avatar.jpg"))
+
+
+def is_up_to_date(source: str) -> bool:
+
+    try:
+        source_mtime = os.path.getmtime(source)
+        return all(os.path.getmtime(path) >= source_mtime for path in derivative_paths(source))
+    except OSError:
+        return False
+
+
+def _save(image: Image.Image, path: str, quality: int) -> None:
+
+    tmp_path = f"{path}.tmp"
+    # a fresh save without exif= drops the metadata (GPS, camera, ...) of the original
+    image.save(tmp_path, format="JPEG", quality=quality, optimize=True, progressive=True)
+    os.replace(tmp_path, path)
+
+
+def avatar_box(width: int, height: int, face: FaceBox | None) -> tuple[int, int, int, int]:
+    """
+    Square (left, top, right, bottom) crop around the face, kept inside the image;
+    the centered square when there is no face box.
+    """
+    side = min(width, height)
+
+    if face is None:
+        left, top = (width - side) // 2, (height - side) // 2
+        return left, top, left + side, top + side
+
+    face_side = max((face.right - face.left) * width, (face.bottom - face.top) * height)
+    side = max(1, min(side, round(face_side * AVATAR_FACE_SCALE)))
+
+    center_x = (face.left + face.right) / 2 * width
+    center_y = (face.top + face.bottom) / 2 * height
+
+    left = min(max(round(center_x - side / 2), 0), width - side)
+    top = min(max(round(center_y - side / 2), 0), height - side)
+
+    return left, top, left + side, top + side
+
+
+def render_derivatives(
+        source: str,
+        gallery_size: int,
+        thumb_size: int,
+        avatar_size: int,
+        quality: int,
+        face: FaceBox | None = None) -> DerivativePaths:
+    """
+    Write the gallery, thumbnail and avatar variants of a photo. Runs in a worker process.
+
+    `face` is the box found by face detection, in the pixel orientation the
+    detector saw (the stored one, before any EXIF rotation).
+    """
+    paths = derivative_paths(source)
+    os.makedirs(os.path.dirname(paths.gallery), exist_ok=True)
+
+    with Image.open(source) as original:
+        original.load()
+        # crop in the detector's orientation, then apply the camera rotation before the EXIF that carries it is dropped
+        avatar = ImageOps.exif_transpose(original.crop(avatar_box(*original.size, face))).convert("RGB")
+        image = ImageOps.exif_transpose(original).convert("RGB")
+
+    image.thumbnail((gallery_size, gallery_size), Image.Resampling.LANCZOS)
+    _save(image, paths.gallery, quality)
+
+    image.thumbnail((thumb_size, thumb_size), Image.Resampling.LANCZOS)
+    _save(image, paths.thumb, quality)
+
+    avatar.thumbnail((avatar_size, avatar_size), Image.Resampling.LANCZOS)
+    _save(avatar, paths.avatar, quality)
+
+    return paths
+
+
+_derivative_pool: ProcessPoolExecutor | None = None
+
+
+def get_derivative_pool(config: Config) -> ProcessPoolExecutor:
+    """
+    Get or create the process pool for image work.
+    """
+    global _derivative_pool
+
+    if _derivative_pool is None:
+        _derivative_pool = ProcessPoolExecutor(
+            max_workers=config.media.workers,
+            # the bot runs threads (watchdog, executors), which do not survive a fork
+            mp_context=multiprocessing.get_context("spawn"))
+
+    return _derivative_pool
+
+
+def shutdown_derivative_pool() -> None:
+
+    global _derivative_pool
+
+    if _derivative_pool is not None:
+        _derivative_pool.shutdown(wait=False, cancel_futures=True)
+        _derivative_pool = None
+
+
+async def make_derivatives(config: Config, source: str, face: FaceBox | None = None) -> DerivativePaths:
+
+    loop = asyncio.get_running_loop()
+
+    return await loop.run_in_executor(
+        get_derivative_pool(config),
+        render_derivatives,
+        source,
+        config.media.gallery_size,
+        config.media.thumb_size,
+        config.media.avatar_size,
+        config.media.jpeg_quality,
+        face)
@@ -0,0 +1,92 @@
+import os
+import logging
+from typing import BinaryIO
+
+import httpx
+
+from ..config import Config
+
+
+class FaceServiceClient:
+    """
+    Long-lived client of the face recognition microservice (FACE_RECOGNITION_URL).
+
+    One pooled httpx client with keep-alive is shared by all calls. Images are
+    passed as file objects (the download buffers), which httpx streams into
+    the multipart body without copying them first.
+    """
+
+    def __init__(self, base_url: str, *, timeout: float, max_connections: int):
+        self.base_url = base_url.rstrip("/")
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections))
+
+    async def analyze(self, name: str, image: BinaryIO) -> dict:
+
+        image.seek(0)
+        resp = await self._client.post(
+            f"{self.base_url}/analyze",
+            files={"file": (name, image, "image/jpeg")})
+        resp.raise_for_status()
+
+        return resp.json()
+
+    async def analyze_batch(self, images: list[tuple[str, BinaryIO]]) -> list[dict]:
+        """
+        Analyse several images in one request; results come back in the same order.
+        """
+        for _, image in images:
+            image.seek(0)
+
+        resp = await self._client.post(
+            f"{self.base_url}/analyze_batch",
+            files=[("files", (name, image, "image/jpeg")) for name, image in images])
+        resp.raise_for_status()
+
+        results: list[dict] = resp.json().get("results", [])
+        if len(results) != len(images):
+            raise ValueError(f"Face service returned {len(results)} results for {len(images)} images")
+
+        return results
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+
+def face_service_url() -> str | None:
+    return os.getenv("FACE_RECOGNITION_URL") or None
+
+
+_face_client: FaceServiceClient | None = None
+
+
+def get_face_client(config: Config) -> FaceServiceClient | None:
+    """
+    Get or create the shared face service client; None when FACE_RECOGNITION_URL is not set.
+    """
+    global _face_client
+
+    url = face_service_url()
+    if url is None:
+        return None
+
+    if _face_client is None:
+        _face_client = FaceServiceClient(
+            url,
+            timeout=config.face.service_timeout,
+            max_connections=config.face.service_max_connections)
+
+    return _face_client
+
+
+async def close_face_client() -> None:
+
+    global _face_client
+
+    if _face_client is not None:
+        await _face_client.close()
+        _face_client = None
+        logging.info("Face service client closed")
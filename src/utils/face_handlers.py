@@ -1,24 +1,104 @@
+import asyncio
 import logging
-import os
 from io import BytesIO
 from typing import Optional, Tuple
 
 from aiogram import Bot
-import httpx
+from aiogram.types import File, PhotoSize
 
-# Try to import local face_recognition library if available
-try:
-    import face_recognition  # type: ignore
-except Exception:
-    face_recognition = None  # Fallback to HTTP service in dev
+from ..config import Config
+from ..custom_types import FaceBox, FaceAnalysis
+from .redis_pool import get_redis
+from .face_pool import get_face_analyzer, face_recognition_available, FaceServiceBusy
+from .image_quality import assess_image
+from .face_client import get_face_client
+
+# Local face_recognition (run in worker processes) if installed; FACE_RECOGNITION_URL takes precedence
+LOCAL_FACE_RECOGNITION: bool = face_recognition_available()
+
+
+def face_box_key(file_unique_id: str) -> str:
+    return f"face_box:{file_unique_id}"
+
+
+async def save_face_box(config: Config, file_unique_id: str, face_box: FaceBox) -> None:
+
+    try:
+        await get_redis(config.redis.temp).set(
+            face_box_key(file_unique_id), face_box.model_dump_json(), ex=config.cache.face_box_ttl)
+    except Exception as e:
+        logging.warning(f"Can't store face box of {file_unique_id}: {e}")
+
+
+async def get_face_box(config: Config, file_unique_id: str) -> Optional[FaceBox]:
+    """
+    Face box found when the photo was analyzed, if it was.
+    """
+    try:
+        raw = await get_redis(config.redis.temp).get(face_box_key(file_unique_id))
+    except Exception as e:
+        logging.warning(f"Can't read face box of {file_unique_id}: {e}")
+        return None
+
+    return FaceBox.model_validate_json(raw) if raw else None
+
+
+FACE_NOT_FOUND = '😕 Лицо не найдено. Попробуйте фото, где лицо видно лучше.'
+MULTIPLE_FACES = '😕 Найдено несколько лиц. Попробуйте фото, где лицо видно лучше.'
+FACE_TOO_SMALL = '⚠️ Лицо слишком маленькое (менее 10% кадра). Пожалуйста, загрузи фото, где лицо крупнее.'
+NO_IMAGE_SIZE = '⚠️ Не удалось определить размер изображения.'
+
+QUALITY_MESSAGES: dict[str, str] = {
+    "unreadable": '⚠️ Не удалось открыть изображение. Попробуй другое фото.',
+    "low_resolution": '⚠️ Фото слишком маленькое. Загрузи фото в лучшем разрешении.',
+    "too_dark": '🌑 Фото слишком тёмное. Попробуй снимок при хорошем освещении.',
+    "too_bright": '☀️ Фото слишком светлое (пересвечено). Попробуй другой снимок.',
+    "low_contrast": '🌫️ Фото слишком блёклое, лицо плохо различимо. Попробуй другой снимок.',
+    "blurry": '📷 Фото размыто. Загрузи более чёткий снимок.',
+}
+
+# Verdicts about the photo itself; anything else (timeouts, service errors) may pass on retry
+FACE_VERDICTS = {FACE_NOT_FOUND, MULTIPLE_FACES, FACE_TOO_SMALL, NO_IMAGE_SIZE, *QUALITY_MESSAGES.values()}
+
+
+def face_analysis_key(file_unique_id: str) -> str:
+    return f"face_analysis:{file_unique_id}"
+
+
+async def get_face_analysis(config: Config, file_unique_id: str) -> Optional[FaceAnalysis]:
+
+    try:
+        raw = await get_redis(config.redis.temp).get(face_analysis_key(file_unique_id))
+    except Exception as e:
+        logging.warning(f"Can't read face analysis of {file_unique_id}: {e}")
+        return None
+
+    return FaceAnalysis.model_validate_json(raw) if raw else None
+
+
+async def save_face_analysis(config: Config, file_unique_id: str, analysis: FaceAnalysis) -> None:
+
+    try:
+        await get_redis(config.redis.temp).set(
+            face_analysis_key(file_unique_id), analysis.model_dump_json(), ex=config.cache.face_box_ttl)
+    except Exception as e:
+        logging.warning(f"Can't store face analysis of {file_unique_id}: {e}")
 
 
 async def analyze_face_in_image(
     bot: Bot, 
     file_id: str,
-    user_id: int) -> Tuple[bool, Optional[str], Optional[float]]:
+    user_id: int,
+    config: Config,
+    file_unique_id: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[float]]:
     """
     Analyzes a photo for face detection and quality.
+    Detection runs in the face analysis process pool (see face_pool) or in the
+    face service (see face_client).
+    Verdicts are cached by file_unique_id, so a photo is analyzed once; pass
+    `file_unique_id` when it is known to skip even the download.
+    The face box of a suitable photo is stored by its file_unique_id
+    (see get_face_box), so the photo can be cropped later without detecting again.
     
     Returns:
         Tuple[bool, Optional[str], Optional[float]]: 
@@ -26,67 +106,184 @@ async def analyze_face_in_image(
         - error_message: Optional[str] - error message if photo is not suitable
         - face_ratio: Optional[float] - face to image ratio if photo is suitable
     """
-    buf = BytesIO()
-    
     try:
-        await bot.download(file=file_id, destination=buf)
-        buf.seek(0)
-        face_service_url = os.getenv("FACE_RECOGNITION_URL")
-
-        if face_recognition is not None and not face_service_url:
-            # Local processing using face_recognition library
-            image = face_recognition.load_image_file(buf)
-            h, w = image.shape[:2]
-            img_area = h * w
-
-            face_locations = face_recognition.face_locations(image)
-
-            if len(face_locations) == 0:
-                logging.error(f"Face not found in image: {file_id} for user: {user_id}")
-                return False, '😕 Лицо не найдено. Попробуйте фото, где лицо видно лучше.', None
-
-            if len(face_locations) > 1:
-                logging.error(f"Multiple faces found in image: {file_id} for user: {user_id}")
-                return False, '😕 Найдено несколько лиц. Попробуйте фото, где лицо видно лучше.', None
-
-            (top, right, bottom, left) = face_locations[0]
-            face_area = (right - left) * (bottom - top)
-
-            if img_area == 0:
-                logging.error(f"Image area is 0 in image: {file_id} for user: {user_id}")
-                return False, '⚠️ Не удалось определить размер изображения.', None
-
-            face_ratio = face_area / img_area
-
-            if face_ratio <= 0.10:
-                logging.error(f"Face ratio is too small: {face_ratio} in image: {file_id} for user: {user_id}")
-                return False, '⚠️ Лицо слишком маленькое (менее 10% кадра). Пожалуйста, загрузи фото, где лицо крупнее.', None
-
-            return True, None, face_ratio
-        else:
-            # HTTP fallback to face recognition microservice
-            if not face_service_url:
-                logging.error("FACE_RECOGNITION_URL is not set and face_recognition is unavailable")
-                return False, '❌ Сервис распознавания лиц недоступен в режиме разработки.', None
-
-            buf.seek(0)
-            files = {"file": (f"{file_id}.jpg", buf.getvalue(), "image/jpeg")}
-            async with httpx.AsyncClient(timeout=15.0) as client:
-                resp = await client.post(f"{face_service_url}/analyze", files=files)
-                data = resp.json()
-
-            if not data.get("success"):
-                error = data.get("error") or 'Неизвестная ошибка сервиса'
-                # Map to localized messages similar to local flow
-                if error == "Face not found":
-                    return False, '😕 Лицо не найдено. Попробуйте фото, где лицо видно лучше.', None
-                if error == "Multiple faces found":
-                    return False, '😕 Найдено несколько лиц. Попробуйте фото, где лицо видно лучше.', None
-                if error.startswith("Face too small"):
-                    return False, '⚠️ Лицо слишком маленькое (менее 10% кадра). Пожалуйста, загрузи фото, где лицо крупнее.', data.get("face_ratio")
-                return False, f'❌ Ошибка сервиса распознавания лиц: {error}', None
-
-            return True, None, float(data.get("face_ratio", 0))
-        
+        cached = await get_face_analysis(config, file_unique_id) if file_unique_id else None
+
+        if cached is None:
+            file = await bot.get_file(file_id)
+            # a known file_unique_id has just missed; only a new one is worth another lookup
+            if file.file_unique_id != file_unique_id:
+                file_unique_id = file.file_unique_id
+                cached = await get_face_analysis(config, file_unique_id)
+
+        if cached is not None:
+            return cached.success, cached.error, cached.face_ratio
+
+        buf = await download_image(bot, file)
+        success, error, face_ratio, face_box = await _analyze_buffer(buf, file_id, user_id, config)
+
     except Exception as e:
         return False, f'❌ Ошибка при обработке изображения: {str(e)}', None
+
+    await _remember_verdict(config, file_unique_id, success, error, face_ratio, face_box)
+    return success, error, face_ratio
+
+
+async def analyze_faces_batch(
+    bot: Bot,
+    photos: list[PhotoSize],
+    user_id: int,
+    config: Config) -> list[Tuple[bool, Optional[str], Optional[float]]]:
+    """
+    analyze_face_in_image for several photos, sending the ones that need the
+    face service in a single /analyze_batch request. Cached verdicts and
+    prefilter rejections never reach the service.
+    """
+    results: list[Optional[Tuple[bool, Optional[str], Optional[float]]]] = [None] * len(photos)
+    semaphore = asyncio.Semaphore(config.face.profile_concurrency)
+
+    async def prepare(ind: int, photo: PhotoSize) -> Optional[BytesIO]:
+
+        cached = await get_face_analysis(config, photo.file_unique_id)
+        if cached is not None:
+            results[ind] = (cached.success, cached.error, cached.face_ratio)
+            return None
+
+        try:
+            async with semaphore:
+                file = await bot.get_file(photo.file_id)
+                buf = await download_image(bot, file)
+            issue = await asyncio.to_thread(assess_image, buf, config.face)
+        except Exception as e:
+            results[ind] = (False, f'❌ Ошибка при обработке изображения: {str(e)}', None)
+            return None
+
+        if issue is not None:
+            results[ind] = (False, QUALITY_MESSAGES[issue], None)
+            await _remember_verdict(config, photo.file_unique_id, *results[ind], None)
+            return None
+
+        return buf
+
+    buffers = await asyncio.gather(*(prepare(ind, photo) for ind, photo in enumerate(photos)))
+    pending = [(ind, buf) for ind, buf in enumerate(buffers) if buf is not None]
+
+    if pending:
+        try:
+            verdicts = [
+                _service_verdict(data) for data in await get_face_client(config).analyze_batch(
+                    [(f"{photos[ind].file_id}.jpg", buf) for ind, buf in pending])]
+        except Exception as e:
+            logging.error(f"Face service batch failed for user {user_id}: {e}")
+            verdicts = [(False, f'❌ Ошибка сервиса распознавания лиц: {e}', None, None)] * len(pending)
+
+        for (ind, _), (success, error, face_ratio, face_box) in zip(pending, verdicts):
+            results[ind] = (success, error, face_ratio)
+            await _remember_verdict(config, photos[ind].file_unique_id, success, error, face_ratio, face_box)
+
+    return results
+
+
+async def download_image(bot: Bot, file: File) -> BytesIO:
+
+    buf = BytesIO()
+    await bot.download_file(file.file_path, destination=buf)
+    buf.seek(0)
+    return buf
+
+
+async def _remember_verdict(
+    config: Config,
+    file_unique_id: str,
+    success: bool,
+    error: Optional[str],
+    face_ratio: Optional[float],
+    face_box: Optional[FaceBox]) -> None:
+
+    if success and face_box is not None:
+        await save_face_box(config, file_unique_id, face_box)
+
+    if success or error in FACE_VERDICTS:
+        await save_face_analysis(
+            config, file_unique_id, FaceAnalysis(success=success, error=error, face_ratio=face_ratio))
+
+
+def _service_verdict(data: dict) -> Tuple[bool, Optional[str], Optional[float], Optional[FaceBox]]:
+    """
+    Map a face service result to (success, localized error, face ratio, face box).
+    """
+    if not data.get("success"):
+        error = data.get("error") or 'Неизвестная ошибка сервиса'
+        # Map to localized messages similar to local flow
+        if error == "Face not found":
+            return False, FACE_NOT_FOUND, None, None
+        if error == "Multiple faces found":
+            return False, MULTIPLE_FACES, None, None
+        if error.startswith("Face too small"):
+            return False, FACE_TOO_SMALL, data.get("face_ratio"), None
+        return False, f'❌ Ошибка сервиса распознавания лиц: {error}', None, None
+
+    face_box = None
+    # the service may report where the face is: (top, right, bottom, left) and [width, height]
+    if data.get("face_location") and data.get("image_size"):
+        width, height = data["image_size"]
+        face_box = FaceBox.from_pixels(data["face_location"], width, height)
+
+    return True, None, float(data.get("face_ratio", 0)), face_box
+
+
+async def _analyze_buffer(
+    buf: BytesIO,
+    file_id: str,
+    user_id: int,
+    config: Config) -> Tuple[bool, Optional[str], Optional[float], Optional[FaceBox]]:
+
+    # a few milliseconds of NumPy spare the detector obviously unusable photos
+    issue = await asyncio.to_thread(assess_image, buf, config.face)
+    if issue is not None:
+        logging.info(f"Photo rejected by prefilter ({issue}): {file_id} for user: {user_id}")
+        return False, QUALITY_MESSAGES[issue], None, None
+
+    face_client = get_face_client(config)
+
+    if face_client is not None:
+        return _service_verdict(await face_client.analyze(f"{file_id}.jpg", buf))
+
+    if not LOCAL_FACE_RECOGNITION:
+        logging.error("FACE_RECOGNITION_URL is not set and face_recognition is unavailable")
+        return False, '❌ Сервис распознавания лиц недоступен в режиме разработки.', None, None
+
+    # Local processing using face_recognition library, off the event loop
+    try:
+        face_locations, w, h = await get_face_analyzer(config).detect(buf.getvalue())
+    except FaceServiceBusy:
+        logging.warning(f"Face analysis queue is full, image: {file_id} for user: {user_id}")
+        return False, '⏳ Сейчас много фотографий на проверке. Попробуй ещё раз через минуту.', None, None
+    except asyncio.TimeoutError:
+        logging.error(f"Face analysis timed out for image: {file_id} for user: {user_id}")
+        return False, '⏳ Проверка фотографии заняла слишком много времени. Попробуй ещё раз.', None, None
+
+    img_area = h * w
+
+    if len(face_locations) == 0:
+        logging.error(f"Face not found in image: {file_id} for user: {user_id}")
+        return False, FACE_NOT_FOUND, None, None
+
+    if len(face_locations) > 1:
+        logging.error(f"Multiple faces found in image: {file_id} for user: {user_id}")
+        return False, MULTIPLE_FACES, None, None
+
+    (top, right, bottom, left) = face_locations[0]
+    face_area = (right - left) * (bottom - top)
+
+    if img_area == 0:
+        logging.error(f"Image area is 0 in image: {file_id} for user: {user_id}")
+        return False, NO_IMAGE_SIZE, None, None
+
+    face_ratio = face_area / img_area
+
+    if face_ratio <= 0.10:
+        logging.error(f"Face ratio is too small: {face_ratio} in image: {file_id} for user: {user_id}")
+        return False, FACE_TOO_SMALL, None, None
+
+    return True, None, face_ratio, FaceBox.from_pixels(face_locations[0], w, h)
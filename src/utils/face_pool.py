@@ -0,0 +1,177 @@
+import asyncio
+import logging
+import importlib.util
+import multiprocessing
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+from PIL import Image
+
+from ..config import Config
+
+
+FaceLocation = tuple[int, int, int, int]  # (top, right, bottom, left) in pixels
+
+
+class FaceServiceBusy(Exception):
+    """More photos are waiting for analysis than the queue allows."""
+
+
+def face_recognition_available() -> bool:
+    # checked without importing: dlib is only ever loaded in the worker processes
+    return importlib.util.find_spec("face_recognition") is not None
+
+
+_face_recognition = None
+
+
+def _init_worker() -> None:
+    """
+    Load face_recognition once per worker and run a detection, so the
+    first real photo does not pay for model setup.
+    """
+    global _face_recognition
+
+    import face_recognition  # type: ignore
+
+    _face_recognition = face_recognition
+    face_recognition.face_locations(np.zeros((64, 64, 3), dtype=np.uint8))
+
+
+def detect_faces(image_bytes: bytes, max_side: int) -> tuple[list[FaceLocation], int, int]:
+    """
+    Face locations and (width, height) of an encoded image, in full-size pixels.
+    Detection runs on a copy no larger than `max_side`. Runs in a worker process.
+    """
+    with Image.open(BytesIO(image_bytes)) as image:
+        width, height = image.size
+        image.draft("RGB", (max_side, max_side))
+        small = image.convert("RGB")
+
+    small.thumbnail((max_side, max_side))
+    scale_x, scale_y = width / small.width, height / small.height
+
+    locations = _face_recognition.face_locations(np.asarray(small))
+
+    return [
+        (round(top * scale_y), round(right * scale_x), round(bottom * scale_y), round(left * scale_x))
+        for top, right, bottom, left in locations
+    ], width, height
+
+
+def _ping() -> None:
+    pass
+
+
+class FaceAnalyzer:
+    """
+    face_recognition in a dedicated process pool.
+
+    Detection is CPU-bound, so it never runs on the event loop. At most
+    `workers` photos are analysed at once and `queue_size` more may wait;
+    beyond that callers get FaceServiceBusy right away instead of queueing
+    behind a burst. A call that takes longer than `timeout` is abandoned,
+    but keeps its slot until its worker finishes it, so slow workers cannot
+    let the executor's own queue grow past the limit.
+    """
+
+    def __init__(self, *, workers: int, queue_size: int, timeout: float, max_side: int):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_side = max_side
+        self._slots = asyncio.Semaphore(workers + queue_size)
+        self._pool: ProcessPoolExecutor | None = None
+        self.analysed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker)
+
+        return self._pool
+
+    async def start(self) -> None:
+        """
+        Start the workers and load the models before the first photo arrives.
+        """
+        loop = asyncio.get_running_loop()
+        pool = self._get_pool()
+        await asyncio.gather(*(loop.run_in_executor(pool, _ping) for _ in range(self.workers)))
+        logging.info(f"Face analysis pool ready: {self.workers} workers")
+
+    async def detect(self, image_bytes: bytes) -> tuple[list[FaceLocation], int, int]:
+
+        if self._slots.locked():
+            self.rejected += 1
+            raise FaceServiceBusy()
+
+        await self._slots.acquire()
+        loop = asyncio.get_running_loop()
+
+        try:
+            future = loop.run_in_executor(self._get_pool(), detect_faces, image_bytes, self.max_side)
+        except BaseException:
+            self._slots.release()
+            raise
+
+        # the slot is held until the worker is really free, not just until we stop waiting for it
+        future.add_done_callback(self._release_slot)
+
+        try:
+            result = await asyncio.wait_for(asyncio.shield(future), timeout=self.timeout)
+
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+        except BrokenProcessPool:
+            # a worker died (e.g. out of memory); start a fresh pool for the next call
+            logging.error("Face analysis pool is broken, restarting it")
+            self.close()
+            raise
+
+        self.analysed += 1
+        return result
+
+    def _release_slot(self, future: asyncio.Future) -> None:
+
+        self._slots.release()
+        # an abandoned call's error has no one waiting for it
+        if not future.cancelled():
+            future.exception()
+
+    def close(self) -> None:
+
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def stats(self) -> dict[str, int]:
+
+        return {"analysed": self.analysed, "rejected": self.rejected, "timeouts": self.timeouts}
+
+
+_face_analyzer: FaceAnalyzer | None = None
+
+
+def get_face_analyzer(config: Config) -> FaceAnalyzer:
+    """
+    Get or create the process-wide face analyzer.
+    """
+    global _face_analyzer
+
+    if _face_analyzer is None:
+        _face_analyzer = FaceAnalyzer(
+            workers=config.face.workers,
+            queue_size=config.face.queue_size,
+            timeout=config.face.timeout,
+            max_side=config.face.detect_max_side)
+
+    return _face_analyzer
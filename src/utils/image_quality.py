@@ -0,0 +1,70 @@
+from io import BytesIO
+from typing import BinaryIO, Literal
+
+import numpy as np
+from PIL import Image, ImageOps
+
+from ..config import Face
+
+
+# side of the grayscale copy the checks run on
+ASSESS_SIDE = 256
+
+QualityIssue = Literal["unreadable", "low_resolution", "too_dark", "too_bright", "low_contrast", "blurry"]
+
+
+def load_gray(image: bytes | BinaryIO, side: int) -> tuple[np.ndarray, int, int]:
+    """
+    Downscaled grayscale copy (float32) of an encoded image (bytes or a file object)
+    and the image's full (width, height).
+    """
+    if isinstance(image, bytes):
+        image = BytesIO(image)
+    image.seek(0)
+
+    with Image.open(image) as image:
+        width, height = image.size
+        # JPEG draft mode decodes straight at 1/2..1/8 scale, far cheaper than a full decode
+        image.draft("L", (side, side))
+        gray = ImageOps.exif_transpose(image).convert("L")
+
+    gray.thumbnail((side, side))
+    return np.asarray(gray, dtype=np.float32), width, height
+
+
+def laplacian_variance(gray: np.ndarray) -> float:
+    """Variance of the 4-neighbour Laplacian: low for blurry images."""
+
+    lap = (
+        gray[:-2, 1:-1] + gray[2:, 1:-1] + gray[1:-1, :-2] + gray[1:-1, 2:]
+        - 4 * gray[1:-1, 1:-1])
+
+    return float(lap.var())
+
+
+def assess_image(image: bytes | BinaryIO, face: Face) -> QualityIssue | None:
+    """
+    Cheap checks that reject photos the face detector need not see.
+    Returns the first problem found, None for a plausible photo.
+    """
+    try:
+        gray, width, height = load_gray(image, ASSESS_SIDE)
+    except Exception:
+        return "unreadable"
+
+    if min(width, height) < face.min_side:
+        return "low_resolution"
+
+    brightness = float(gray.mean())
+    if brightness < face.min_brightness:
+        return "too_dark"
+    if brightness > face.max_brightness:
+        return "too_bright"
+
+    if float(gray.std()) < face.min_contrast:
+        return "low_contrast"
+
+    if laplacian_variance(gray) < face.min_sharpness:
+        return "blurry"
+
+    return None
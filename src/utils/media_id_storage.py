@@ -0,0 +1,134 @@
+import os
+import json
+import logging
+from typing import Optional
+
+from aiogram.types import ContentType
+
+from aiogram_dialog.api.entities import MediaId
+from aiogram_dialog.api.protocols import MediaIdStorageProtocol
+
+from redis.asyncio import Redis
+
+from ..config import Config
+from .redis_pool import get_redis
+
+
+class RedisMediaIdStorage(MediaIdStorageProtocol):
+    """
+    Telegram file ids of local media sent by dialogs, keyed by (path, mtime).
+
+    Replaces aiogram_dialog's in-memory default so a photo is uploaded once,
+    not once per process start: entries live in Redis (with a TTL) and are
+    mirrored in memory. A changed file has a new mtime and therefore misses.
+    """
+
+    def __init__(self, redis: Redis, *, ttl: int, prefix: str = "media_id"):
+        self.redis = redis
+        self.ttl = ttl
+        self.prefix = prefix
+        self._cache: dict[str, MediaId] = {}
+        self.hits = 0
+        self.misses = 0
+        self.saves = 0
+
+    def _key(self, path: Optional[str], url: Optional[str], type: ContentType) -> str | None:
+
+        if path:
+            try:
+                mtime = os.path.getmtime(path)
+            except OSError:
+                return None
+            return f"{self.prefix}:{type}:{path}:{mtime}"
+
+        if url:
+            return f"{self.prefix}:{type}:{url}"
+
+        return None
+
+    async def get_media_id(
+            self,
+            path: Optional[str],
+            url: Optional[str],
+            type: ContentType,
+    ) -> Optional[MediaId]:
+
+        media_id = await self.lookup(path, url, type)
+
+        if media_id is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return media_id
+
+    async def lookup(
+            self,
+            path: Optional[str],
+            url: Optional[str],
+            type: ContentType,
+    ) -> Optional[MediaId]:
+        """Same as get_media_id, without counting a hit or a miss (for background warm-ups)."""
+
+        key = self._key(path, url, type)
+        if key is None:
+            return None
+
+        media_id = self._cache.get(key)
+
+        if media_id is None:
+            try:
+                raw = await self.redis.get(key)
+            except Exception as e:
+                logging.warning(f"Can't read media id {key}: {e}")
+                raw = None
+
+            if raw:
+                data = json.loads(raw)
+                media_id = MediaId(data["file_id"], data.get("file_unique_id"))
+                self._cache[key] = media_id
+
+        return media_id
+
+    async def save_media_id(
+            self,
+            path: Optional[str],
+            url: Optional[str],
+            type: ContentType,
+            media_id: MediaId,
+    ) -> None:
+
+        key = self._key(path, url, type)
+        if key is None:
+            return
+
+        self._cache[key] = media_id
+        self.saves += 1
+
+        try:
+            await self.redis.set(
+                key,
+                json.dumps({"file_id": media_id.file_id, "file_unique_id": media_id.file_unique_id}),
+                ex=self.ttl)
+        except Exception as e:
+            logging.warning(f"Can't store media id {key}: {e}")
+
+    def stats(self) -> dict[str, int]:
+
+        return {"hits": self.hits, "misses": self.misses, "saves": self.saves}
+
+
+_media_id_storage: RedisMediaIdStorage | None = None
+
+
+def get_media_id_storage(config: Config) -> RedisMediaIdStorage:
+    """
+    Get or create the process-wide media id storage.
+    """
+    global _media_id_storage
+
+    if _media_id_storage is None:
+        _media_id_storage = RedisMediaIdStorage(
+            get_redis(config.redis.temp), ttl=config.cache.media_id_ttl)
+
+    return _media_id_storage
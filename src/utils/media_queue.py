@@ -0,0 +1,298 @@
+import os
+import time
+import uuid
+import random
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from aiogram import Bot
+from aiogram.enums import ContentType
+from aiogram_dialog.api.entities import MediaId
+
+from redis.asyncio import Redis
+
+from my_tools import get_datetime_now
+
+from ..config import Config
+from ..custom_types import MediaJob, FaceBox
+from .redis_pool import get_redis
+from .photo_index import get_photo_index
+from .media_id_storage import get_media_id_storage
+from .face_handlers import get_face_box
+from .derivatives import make_derivatives
+
+
+MEDIA_QUEUE_PREFIX = "media_ingest"
+RECENT_JOBS_KEPT = 100
+
+
+class MediaIngestQueue:
+    """
+    Redis-backed queue of Telegram files to download into media/.
+
+    Handlers enqueue a job (file id, destination, metadata) and move on;
+    `workers` tasks take jobs from the Redis list and download them, at
+    most `max_downloads` at once across all workers. A failed download is
+    retried with full-jitter backoff up to `retries` times. A job being
+    handled sits in a "processing" list until it finishes, so jobs cut off
+    by a restart are queued again on the next start. Each job's status is
+    kept for `job_ttl` seconds after it finishes, for the admin panel.
+    """
+
+    def __init__(
+            self,
+            redis: Redis,
+            *,
+            workers: int,
+            max_downloads: int,
+            retries: int,
+            job_ttl: int,
+            backoff_base: float = 1.0,
+            prefix: str = MEDIA_QUEUE_PREFIX):
+        self.redis = redis
+        self.workers = workers
+        self.retries = retries
+        self.job_ttl = job_ttl
+        self.backoff_base = backoff_base
+        self.queue_key = f"{prefix}:queue"
+        self.processing_key = f"{prefix}:processing"
+        self.recent_key = f"{prefix}:recent"
+        self.job_prefix = f"{prefix}:job"
+        self.on_downloaded: dict[str, Callable[[MediaJob], Awaitable[None]]] = {}
+        self._downloads = asyncio.Semaphore(max_downloads)
+        self._wakeup = asyncio.Event()
+        self._workers: list[asyncio.Task] = []
+        self.downloaded = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def enqueue(
+            self,
+            kind: str,
+            user_id: int,
+            file_id: str,
+            destination: str,
+            file_unique_id: str | None = None) -> MediaJob:
+
+        job = MediaJob(
+            id=uuid.uuid4().hex,
+            kind=kind,
+            user_id=user_id,
+            file_id=file_id,
+            file_unique_id=file_unique_id,
+            destination=destination)
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.set(f"{self.job_prefix}:{job.id}", job.model_dump_json())
+            pipe.lpush(self.queue_key, job.id)
+            pipe.zadd(self.recent_key, {job.id: time.time()})
+            pipe.zremrangebyrank(self.recent_key, 0, -RECENT_JOBS_KEPT - 1)
+            await pipe.execute()
+
+        self._wakeup.set()
+        return job
+
+    async def start(self, bot: Bot) -> None:
+        """
+        Queue again whatever a previous run left half-done, then start the workers.
+        """
+        if self._workers:
+            return
+
+        requeued = 0
+        while await self.redis.lmove(self.processing_key, self.queue_key, "RIGHT", "LEFT") is not None:
+            requeued += 1
+        if requeued:
+            logging.warning(f"Media ingestion: {requeued} interrupted jobs queued again")
+
+        self._workers = [asyncio.create_task(self._work(bot)) for _ in range(self.workers)]
+        logging.info(f"Media ingestion started: {self.workers} workers")
+
+    async def _work(self, bot: Bot) -> None:
+
+        delay = 1.0
+
+        while True:
+            try:
+                await self._work_once(bot)
+                delay = 1.0
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                # e.g. Redis went away; the worker must outlive it
+                logging.error(f"Media ingestion worker failed, retrying in {delay:.0f}s: {e!r}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    async def _work_once(self, bot: Bot) -> None:
+
+        # cleared before looking, so an enqueue right after an empty look still wakes us
+        self._wakeup.clear()
+        raw = await self.redis.lmove(self.queue_key, self.processing_key, "RIGHT", "LEFT")
+
+        if raw is None:
+            try:
+                # a job enqueued by another process is picked up on the next poll
+                await asyncio.wait_for(self._wakeup.wait(), timeout=1.0)
+            except asyncio.TimeoutError:
+                pass
+            return
+
+        job_id = raw.decode()
+        try:
+            await self._handle(bot, job_id)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logging.error(f"Media ingestion job {job_id} crashed: {e!r}")
+
+        await self.redis.lrem(self.processing_key, 1, job_id)
+
+    async def _handle(self, bot: Bot, job_id: str) -> None:
+
+        job = await self.get(job_id)
+        if job is None:
+            return
+
+        for attempt in range(self.retries):
+            job.attempts = attempt + 1
+            await self._save(job, "downloading")
+
+            try:
+                os.makedirs(os.path.dirname(job.destination), exist_ok=True)
+                async with self._downloads:
+                    await bot.download(file=job.file_id, destination=job.destination)
+                break
+
+            except Exception as e:
+                job.error = repr(e)
+                if attempt + 1 == self.retries:
+                    self.failed += 1
+                    logging.error(f"Can't download {job.kind} of {job.user_id} to {job.destination}: {e!r}")
+                    await self._save(job, "failed", finished=True)
+                    return
+
+                self.retried += 1
+                await self._save(job, "retrying")
+                await asyncio.sleep(random.uniform(0, (2 ** attempt) * self.backoff_base))
+
+        self.downloaded += 1
+
+        handler = self.on_downloaded.get(job.kind)
+        if handler is not None:
+            try:
+                await handler(job)
+            except Exception as e:
+                logging.error(f"Post-processing of {job.destination} failed: {e!r}")
+
+        job.error = None
+        await self._save(job, "done", finished=True)
+
+    async def _save(self, job: MediaJob, status: str, finished: bool = False) -> None:
+
+        job.status = status
+        job.updated = get_datetime_now()
+        await self.redis.set(
+            f"{self.job_prefix}:{job.id}", job.model_dump_json(), ex=self.job_ttl if finished else None)
+
+    async def get(self, job_id: str) -> MediaJob | None:
+
+        raw = await self.redis.get(f"{self.job_prefix}:{job_id}")
+        return MediaJob.model_validate_json(raw) if raw else None
+
+    async def recent(self, limit: int = 10) -> list[MediaJob]:
+        """
+        Latest jobs, newest first; jobs whose status has expired are left out.
+        """
+        ids: list[bytes] = await self.redis.zrevrange(self.recent_key, 0, limit - 1)
+        if not ids:
+            return []
+
+        raws = await self.redis.mget([f"{self.job_prefix}:{job_id.decode()}" for job_id in ids])
+        return [MediaJob.model_validate_json(raw) for raw in raws if raw]
+
+    async def depth(self) -> dict[str, int]:
+
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.llen(self.queue_key)
+            pipe.llen(self.processing_key)
+            queued, processing = await pipe.execute()
+
+        return {"queued": queued, "processing": processing}
+
+    async def close(self) -> None:
+        """
+        Stop the workers; unfinished jobs stay in the processing list for the next start.
+        """
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    def stats(self) -> dict[str, int]:
+
+        return {"downloaded": self.downloaded, "retried": self.retried, "failed": self.failed}
+
+
+async def register_profile_photo(config: Config, job: MediaJob) -> None:
+    """
+    Index a downloaded profile photo, remember its file id and build its gallery variants.
+    """
+    media_id = MediaId(job.file_id, job.file_unique_id)
+
+    await get_photo_index(config).record(job.user_id, job.destination, media_id.file_id)
+    # the photo is already on Telegram's side: showing it in the gallery needs no upload
+    await get_media_id_storage(config).save_media_id(job.destination, None, ContentType.PHOTO, media_id)
+
+    # the box found when the photo was analyzed (if it was) frames the avatar crop
+    face_box: FaceBox | None = await get_face_box(config, media_id.file_unique_id) if job.file_unique_id else None
+
+    await build_photo_derivatives(config, job.user_id, job.destination, face_box)
+
+
+async def build_photo_derivatives(
+    config: Config,
+    user_id: int,
+    source: str,
+    face_box: FaceBox | None = None) -> None:
+    """
+    Render the gallery variants of a saved profile photo and point the photo index at them.
+
+    The variants are new files: each is uploaded once, when first shown or
+    prefetched, and served by its own file id from then on.
+    """
+    try:
+        await make_derivatives(config, source, face_box)
+    except Exception as e:
+        logging.error(f"Can't build derivatives of {source}: {e}")
+        return
+
+    await get_photo_index(config).record(user_id, source, face_box=face_box)
+
+
+_media_queue: MediaIngestQueue | None = None
+
+
+def get_media_queue(config: Config) -> MediaIngestQueue:
+    """
+    Get or create the process-wide media ingestion queue.
+    """
+    global _media_queue
+
+    if _media_queue is None:
+        _media_queue = MediaIngestQueue(
+            get_redis(config.redis.temp),
+            workers=config.media.ingest_workers,
+            max_downloads=config.media.max_downloads,
+            retries=config.media.ingest_retries,
+            job_ttl=config.media.ingest_job_ttl)
+
+        async def on_photo(job: MediaJob) -> None:
+            await register_profile_photo(config, job)
+
+        _media_queue.on_downloaded["photo"] = on_photo
+
+    return _media_queue
@@ -0,0 +1,296 @@
+import os
+import asyncio
+import logging
+
+from redis.asyncio import Redis
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEvent, FileSystemEventHandler
+
+from ..config import Config
+from ..custom_types import PhotoRecord, FaceBox
+from .redis_pool import get_redis
+from .derivatives import derivative_paths
+
+
+MEDIA_ROOT = "media"
+PROFILE_PHOTO_PREFIX = "4_profile_"
+PHOTO_INDEX_KEY = "photo_index"
+
+
+def profile_photo_dir(user_id: int, root: str = MEDIA_ROOT) -> str:
+    return os.path.join(root, str(user_id), "onboarding")
+
+
+def parse_profile_photo_path(path: str, root: str = MEDIA_ROOT) -> int | None:
+    """
+    User id of a "<root>/<user id>/{onboarding,gallery}/4_profile_*" path, None for any other file.
+    """
+    parts = os.path.normpath(os.path.relpath(path, root)).split(os.sep)
+
+    if len(parts) != 3 or parts[1] not in ("onboarding", "gallery") or not parts[2].startswith(PROFILE_PHOTO_PREFIX):
+        return None
+
+    return int(parts[0]) if parts[0].isdigit() else None
+
+
+def with_derivatives(record: PhotoRecord) -> PhotoRecord:
+    """
+    Fill the variant paths of a record with the derivatives that exist on disk and are not older than the photo.
+    """
+    paths = derivative_paths(record.path)
+
+    for field, path in (("gallery_path", paths.gallery), ("thumb_path", paths.thumb), ("avatar_path", paths.avatar)):
+        try:
+            fresh = os.path.getmtime(path) >= record.mtime
+        except OSError:
+            fresh = False
+        setattr(record, field, path if fresh else None)
+
+    return record
+
+
+class _MediaEventHandler(FileSystemEventHandler):
+    """
+    Runs in the watchdog thread: hands the affected user ids over to the event loop.
+    """
+
+    def __init__(self, index: "PhotoIndex", loop: asyncio.AbstractEventLoop):
+        self.index = index
+        self.loop = loop
+
+    def on_any_event(self, event: FileSystemEvent) -> None:
+
+        if event.is_directory or event.event_type == "opened":
+            return
+
+        for path in (event.src_path, getattr(event, "dest_path", "")):
+            user_id = parse_profile_photo_path(os.fsdecode(path), self.index.root) if path else None
+            if user_id is not None:
+                self.loop.call_soon_threadsafe(self.index.schedule_refresh, user_id)
+
+
+class PhotoIndex:
+    """
+    Latest profile photo per user id.
+
+    The Redis hash (user id -> PhotoRecord JSON) is shared between processes
+    and survives restarts; the in-process mirror answers gallery lookups
+    without I/O. Writers record new photos directly, and a watchdog observer
+    on the media directory catches files added, replaced or removed by hand.
+    """
+
+    def __init__(self, redis: Redis, root: str = MEDIA_ROOT, key: str = PHOTO_INDEX_KEY):
+        self.redis = redis
+        self.root = root
+        self.key = key
+        self.records: dict[int, PhotoRecord] = {}
+        self.missing: set[int] = set()  # users known to have no photo, so they cost no Redis read
+        self._observer: Observer | None = None
+        self._refreshing: dict[int, asyncio.Task] = {}
+
+    async def load(self) -> None:
+        """
+        Fill the mirror from Redis, or from one scan of the media directory if the hash is empty.
+        """
+        raw: dict[bytes, bytes] = await self.redis.hgetall(self.key)
+        self.missing.clear()
+
+        if raw:
+            self.records = {int(uid): PhotoRecord.model_validate_json(value) for uid, value in raw.items()}
+            logging.info(f"Photo index loaded: {len(self.records)} users")
+        else:
+            await self.rebuild()
+
+    async def rebuild(self) -> None:
+        """
+        Re-scan every user's onboarding directory and replace the index.
+        """
+        records: dict[int, PhotoRecord] = await asyncio.to_thread(self._scan_all)
+
+        # what only the bot knows about a photo (file id, face box) is not on disk
+        for uid, record in records.items():
+            current = self.records.get(uid)
+            if current is not None and current.path == record.path:
+                record.file_id = current.file_id
+                record.face_box = current.face_box
+
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.delete(self.key)
+            if records:
+                pipe.hset(self.key, mapping={str(uid): r.model_dump_json() for uid, r in records.items()})
+            await pipe.execute()
+
+        self.records = records
+        self.missing.clear()
+        logging.info(f"Photo index rebuilt: {len(records)} users")
+
+    async def get(self, user_id: int) -> PhotoRecord | None:
+        """
+        Latest photo of a user; falls back to Redis for photos recorded by another process.
+        """
+        record = self.records.get(user_id)
+        if record is not None or user_id in self.missing:
+            return record
+
+        raw = await self.redis.hget(self.key, str(user_id))
+        if raw:
+            record = PhotoRecord.model_validate_json(raw)
+            self.records[user_id] = record
+        else:
+            # a photo saved later reaches this process through record() or the watcher
+            self.missing.add(user_id)
+
+        return record
+
+    async def latest_path(self, user_id: int) -> str | None:
+        """Path to show for a user's latest photo: the gallery variant once it exists."""
+
+        record = await self.get(user_id)
+        return record.display_path if record is not None else None
+
+    async def record(
+            self,
+            user_id: int,
+            path: str,
+            file_id: str | None = None,
+            face_box: FaceBox | None = None) -> None:
+        """
+        Register a photo just written to disk. Older photos than the indexed one are ignored.
+        """
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            logging.warning(f"Photo {path} of {user_id} is gone before indexing")
+            return
+
+        current = self.records.get(user_id)
+        if current is not None and os.path.basename(current.path) > os.path.basename(path):
+            return
+
+        same_photo = current is not None and current.path == path
+
+        await self._store(user_id, with_derivatives(PhotoRecord(
+            path=path,
+            mtime=stat.st_mtime,
+            size=stat.st_size,
+            file_id=file_id or (current.file_id if same_photo else None),
+            face_box=face_box or (current.face_box if same_photo else None))))
+
+    def schedule_refresh(self, user_id: int) -> None:
+        """
+        Re-read one user's directory; bursts of events for the same user collapse into one refresh.
+        """
+        task = self._refreshing.get(user_id)
+        if task is None or task.done():
+            self._refreshing[user_id] = asyncio.create_task(self.refresh(user_id))
+
+    async def refresh(self, user_id: int) -> None:
+
+        # let the writer finish the file before it is stat'ed
+        await asyncio.sleep(0.5)
+        self._refreshing.pop(user_id, None)
+
+        try:
+            record = await asyncio.to_thread(self._scan_user, user_id)
+            current = self.records.get(user_id)
+
+            if record is None:
+                self.missing.add(user_id)
+                if current is not None:
+                    self.records.pop(user_id, None)
+                    await self.redis.hdel(self.key, str(user_id))
+                return
+
+            if current is not None and current.path == record.path:
+                record.file_id = current.file_id
+                record.face_box = current.face_box
+                if current == record:
+                    return
+
+            await self._store(user_id, record)
+
+        except Exception as e:
+            logging.error(f"Can't refresh photo index for {user_id}: {e}")
+
+    def start_watching(self) -> None:
+
+        if self._observer is not None:
+            return
+
+        os.makedirs(self.root, exist_ok=True)
+
+        self._observer = Observer()
+        self._observer.schedule(
+            _MediaEventHandler(self, asyncio.get_running_loop()), self.root, recursive=True)
+        self._observer.daemon = True
+        self._observer.start()
+
+    def stop_watching(self) -> None:
+
+        if self._observer is None:
+            return
+
+        self._observer.stop()
+        self._observer.join(timeout=5)
+        self._observer = None
+
+        for task in self._refreshing.values():
+            task.cancel()
+        self._refreshing.clear()
+
+    async def _store(self, user_id: int, record: PhotoRecord) -> None:
+
+        self.records[user_id] = record
+        self.missing.discard(user_id)
+        await self.redis.hset(self.key, str(user_id), record.model_dump_json())
+
+    def _scan_user(self, user_id: int) -> PhotoRecord | None:
+
+        try:
+            entries = [
+                entry for entry in os.scandir(profile_photo_dir(user_id, self.root))
+                if entry.is_file() and entry.name.startswith(PROFILE_PHOTO_PREFIX)]
+        except FileNotFoundError:
+            return None
+
+        if not entries:
+            return None
+
+        latest = max(entries, key=lambda entry: entry.name)
+        stat = latest.stat()
+        return with_derivatives(PhotoRecord(
+            path=os.path.join(profile_photo_dir(user_id, self.root), latest.name),
+            mtime=stat.st_mtime,
+            size=stat.st_size))
+
+    def _scan_all(self) -> dict[int, PhotoRecord]:
+
+        records: dict[int, PhotoRecord] = {}
+
+        try:
+            user_dirs = [entry.name for entry in os.scandir(self.root) if entry.is_dir() and entry.name.isdigit()]
+        except FileNotFoundError:
+            return records
+
+        for name in user_dirs:
+            record = self._scan_user(int(name))
+            if record is not None:
+                records[int(name)] = record
+
+        return records
+
+
+_photo_index: PhotoIndex | None = None
+
+
+def get_photo_index(config: Config) -> PhotoIndex:
+    """
+    Get or create the process-wide photo index.
+    """
+    global _photo_index
+
+    if _photo_index is None:
+        _photo_index = PhotoIndex(get_redis(config.redis.temp))
+
+    return _photo_index
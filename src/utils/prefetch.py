@@ -0,0 +1,135 @@
+import asyncio
+import logging
+from typing import Iterable
+
+from aiogram import Bot
+from aiogram.types import ContentType, FSInputFile
+
+from aiogram_dialog.api.entities import MediaId
+
+from ..config import Config
+from ..custom_types import Gallery
+from .photo_index import get_photo_index
+from .media_id_storage import get_media_id_storage
+
+
+class ProfilePrefetcher:
+    """
+    Warms the back/next profiles of a carousel in the background.
+
+    For each neighbour the card text is rendered, the photo path is pulled
+    into the photo index mirror and the photo's Telegram file id is looked
+    up; with `cache.media_cache_chat_id` set, a photo that was never sent is
+    uploaded there once so the real carousel step goes by file id.
+
+    Each viewer gets `per_user` concurrent warm-ups at most and uploads share
+    a global limit; work over budget is skipped, never queued, so
+    prefetching cannot pile up behind interactive traffic.
+    """
+
+    def __init__(self, config: Config, *, per_user: int, uploads: int):
+        self.config = config
+        self.per_user = per_user
+        self._user_slots: dict[int, int] = {}
+        self._uploads = asyncio.Semaphore(uploads)
+        self._warming: set[tuple[str, int]] = set()
+        self._tasks: set[asyncio.Task] = set()
+        self.warmed = 0
+        self.skipped = 0
+        self.uploaded = 0
+
+    def schedule(self, bot: Bot, user_id: int, gallery: Gallery, positions: Iterable[int]) -> None:
+
+        for position in positions:
+            person_id = gallery.persons[position].id
+            key = (gallery.version, person_id)
+
+            if key in self._warming:
+                continue
+
+            if self._user_slots.get(user_id, 0) >= self.per_user:
+                self.skipped += 1
+                continue
+
+            self._user_slots[user_id] = self._user_slots.get(user_id, 0) + 1
+            self._warming.add(key)
+
+            task = asyncio.create_task(self._warm(bot, gallery, position))
+            self._tasks.add(task)
+            task.add_done_callback(lambda t, user_id=user_id, key=key: self._on_done(t, user_id, key))
+
+    def _on_done(self, task: asyncio.Task, user_id: int, key: tuple[str, int]) -> None:
+
+        self._tasks.discard(task)
+        self._warming.discard(key)
+
+        slots = self._user_slots.get(user_id, 1) - 1
+        if slots > 0:
+            self._user_slots[user_id] = slots
+        else:
+            self._user_slots.pop(user_id, None)
+
+        if not task.cancelled() and task.exception() is not None:
+            logging.warning(f"Profile prefetch failed for {key[1]}: {task.exception()}")
+
+    async def _warm(self, bot: Bot, gallery: Gallery, position: int) -> None:
+
+        gallery.card(position)
+
+        person_id = gallery.persons[position].id
+        path = await get_photo_index(self.config).latest_path(person_id)
+        if path is None:
+            self.warmed += 1
+            return
+
+        storage = get_media_id_storage(self.config)
+        if await storage.lookup(path, None, ContentType.PHOTO) is None:
+            await self._upload(bot, path)
+
+        self.warmed += 1
+
+    async def _upload(self, bot: Bot, path: str) -> None:
+
+        chat_id = self.config.cache.media_cache_chat_id
+        if chat_id is None or self._uploads.locked():
+            return
+
+        async with self._uploads:
+            message = await bot.send_photo(chat_id=chat_id, photo=FSInputFile(path), disable_notification=True)
+            photo = message.photo[-1]
+            await get_media_id_storage(self.config).save_media_id(
+                path, None, ContentType.PHOTO, MediaId(photo.file_id, photo.file_unique_id))
+            self.uploaded += 1
+
+            try:
+                await bot.delete_message(chat_id=chat_id, message_id=message.message_id)
+            except Exception as e:
+                logging.debug(f"Can't delete prefetch upload {message.message_id}: {e}")
+
+    async def close(self) -> None:
+
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+
+        return {"warmed": self.warmed, "skipped": self.skipped, "uploaded": self.uploaded}
+
+
+_profile_prefetcher: ProfilePrefetcher | None = None
+
+
+def get_profile_prefetcher(config: Config) -> ProfilePrefetcher:
+    """
+    Get or create the process-wide profile prefetcher.
+    """
+    global _profile_prefetcher
+
+    if _profile_prefetcher is None:
+        _profile_prefetcher = ProfilePrefetcher(
+            config,
+            per_user=config.cache.prefetch_per_user,
+            uploads=config.cache.prefetch_uploads)
+
+    return _profile_prefetcher
@@ -0,0 +1,25 @@
+from redis.asyncio import Redis
+
+
+# One client (and connection pool) per Redis URL, shared by background services
+_clients: dict[str, Redis] = {}
+
+
+def get_redis(url: str) -> Redis:
+    """
+    Get or create a shared Redis client for the given URL.
+    """
+    client = _clients.get(url)
+    if client is None:
+        client = Redis.from_url(url)
+        _clients[url] = client
+
+    return client
+
+
+async def close_redis_clients() -> None:
+
+    for client in _clients.values():
+        await client.aclose()
+
+    _clients.clear()
@@ -0,0 +1,189 @@
+import asyncio
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, TypeVar
+
+from pydantic import BaseModel
+from redis.asyncio import Redis
+
+
+T = TypeVar("T", bound=BaseModel)
+
+
+@dataclass
+class _Entry(Generic[T]):
+
+    value: T
+    fetched_at: float
+
+
+class RosterCache(Generic[T]):
+    """
+    Two-tier cache for parsed rosters: process memory first, Redis second.
+
+    Entries younger than `ttl` are served as is. Entries younger than
+    `ttl + stale_ttl` are served immediately while a background refresh
+    replaces them. Older or missing entries are loaded synchronously.
+    Concurrent loads of the same key share one loader call.
+    """
+
+    def __init__(
+        self,
+        loader: Callable[[str], Awaitable[T]],
+        model: type[T],
+        *,
+        ttl: float,
+        stale_ttl: float,
+        redis: Redis | None = None,
+        prefix: str = "roster",
+    ):
+        self.loader = loader
+        self.model = model
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.redis = redis
+        self.prefix = prefix
+        self._entries: dict[str, _Entry[T]] = {}
+        self._loading: dict[str, asyncio.Task] = {}
+        self._generations: dict[str, int] = {}
+
+    def _redis_key(self, key: str) -> str:
+        return f"{self.prefix}:{key}"
+
+    async def get(self, key: str) -> T:
+
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = await self._read_redis(key)
+            if entry is not None:
+                self._entries[key] = entry
+
+        if entry is not None:
+            age = time.time() - entry.fetched_at
+            if age < self.ttl:
+                return entry.value
+            if age < self.ttl + self.stale_ttl:
+                self._start_load(key)
+                return entry.value
+
+        return await asyncio.shield(self._start_load(key))
+
+    async def patch(self, key: str, mutate: Callable[[T], None]) -> None:
+        """
+        Apply an in-place change to a cached value in both tiers, e.g. after a
+        write that has been queued but has not reached the source yet.
+        """
+        entry = self._entries.get(key) or await self._read_redis(key)
+        if entry is None:
+            return
+
+        mutate(entry.value)
+        self._entries[key] = entry
+        # a load started earlier may have read the source before this change
+        self._loading.pop(key, None)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        await self._write_redis(key, entry)
+
+    def expire(self, key: str | None = None) -> None:
+        """
+        Mark entries as stale so the next read refreshes them in the background.
+        Loads that started before the call are not stored.
+        """
+        keys = [key] if key is not None else list(set(self._entries) | set(self._loading))
+
+        for k in keys:
+            entry = self._entries.get(k)
+            if entry is not None:
+                entry.fetched_at = min(entry.fetched_at, time.time() - self.ttl)
+            self._loading.pop(k, None)
+            self._generations[k] = self._generations.get(k, 0) + 1
+
+    async def invalidate(self, key: str | None = None) -> None:
+        """
+        Drop one key (or every key) from both tiers.
+        Loads that started before the invalidation are not stored.
+        """
+        keys = [key] if key is not None else list(set(self._entries) | set(self._loading))
+
+        for k in keys:
+            self._entries.pop(k, None)
+            self._loading.pop(k, None)
+            self._generations[k] = self._generations.get(k, 0) + 1
+
+        if self.redis is None:
+            return
+
+        try:
+            if key is not None:
+                await self.redis.delete(self._redis_key(key))
+            else:
+                redis_keys = [k async for k in self.redis.scan_iter(match=self._redis_key("*"))]
+                if redis_keys:
+                    await self.redis.delete(*redis_keys)
+        except Exception as e:
+            logging.error(f"Can't invalidate {self.prefix} cache in Redis: {e}")
+
+    def _start_load(self, key: str) -> asyncio.Task:
+
+        task = self._loading.get(key)
+        if task is None:
+            task = asyncio.create_task(self._load(key, self._generations.get(key, 0)))
+            self._loading[key] = task
+            task.add_done_callback(lambda t: self._on_load_done(key, t))
+
+        return task
+
+    def _on_load_done(self, key: str, task: asyncio.Task) -> None:
+
+        if self._loading.get(key) is task:
+            del self._loading[key]
+
+        if not task.cancelled() and task.exception() is not None:
+            logging.error(f"Can't refresh {self.prefix} cache for {key}: {task.exception()}")
+
+    async def _load(self, key: str, generation: int) -> T:
+
+        value: T = await self.loader(key)
+        entry = _Entry(value=value, fetched_at=time.time())
+
+        if self._generations.get(key, 0) == generation:
+            self._entries[key] = entry
+            await self._write_redis(key, entry)
+
+        return value
+
+    async def _read_redis(self, key: str) -> _Entry[T] | None:
+
+        if self.redis is None:
+            return None
+
+        try:
+            raw = await self.redis.get(self._redis_key(key))
+            if not raw:
+                return None
+            data = json.loads(raw)
+            return _Entry(
+                value=self.model.model_validate(data["value"]),
+                fetched_at=data["fetched_at"])
+
+        except Exception as e:
+            logging.warning(f"Can't read {self.prefix} cache for {key} from Redis: {e}")
+            return None
+
+    async def _write_redis(self, key: str, entry: _Entry[T]) -> None:
+
+        if self.redis is None:
+            return
+
+        payload = json.dumps({
+            "fetched_at": entry.fetched_at,
+            "value": entry.value.model_dump(mode="json"),
+        }, ensure_ascii=False)
+
+        try:
+            await self.redis.set(
+                self._redis_key(key), payload, ex=int(self.ttl + self.stale_ttl))
+        except Exception as e:
+            logging.warning(f"Can't write {self.prefix} cache for {key} to Redis: {e}")
@@ -0,0 +1,80 @@
+import logging
+from typing import Iterable
+
+from .sheets_async import SheetsAsync
+
+
+class RowIndex:
+    """
+    Maintained person id -> sheet row map for one tab.
+
+    Built from a single read of the id column. Before a write the rows we
+    are about to touch are checked with one batchGet of their id cells;
+    rows that moved (e.g. an admin inserted a row) are repaired from what
+    the check saw, and only if an id is still unaccounted for is the id
+    column re-read.
+    """
+
+    def __init__(self, sheet: SheetsAsync, tab: str, id_column: str, first_row: int):
+        self.sheet = sheet
+        self.tab = tab
+        self.id_column = id_column
+        self.first_row = first_row
+        self.rows: dict[int, int] = {}
+        self.built = False
+
+    def seed(self, rows: dict[int, int]) -> None:
+        """Fill the index from data read elsewhere (e.g. a roster snapshot)."""
+        self.rows = dict(rows)
+        self.built = True
+
+    async def rebuild(self) -> None:
+
+        res = await self.sheet.read(f"{self.tab}!{self.id_column}{self.first_row}:{self.id_column}")
+
+        self.rows = {}
+        for ind, row in enumerate(res.get("values", [])):
+            cell = row[0].strip() if row else ""
+            if cell.isdigit():
+                self.rows[int(cell)] = self.first_row + ind
+
+        self.built = True
+        logging.info(f"Row index for {self.tab} rebuilt: {len(self.rows)} ids")
+
+    async def resolve(self, ids: Iterable[int]) -> dict[int, int | None]:
+        """
+        Verified rows for the given ids; None for ids that are not in the tab.
+        """
+        ids = set(ids)
+
+        if not self.built:
+            await self.rebuild()
+            return {pid: self.rows.get(pid) for pid in ids}
+
+        expected = {pid: self.rows[pid] for pid in ids if pid in self.rows}
+        moved: set[int] = ids - set(expected)
+
+        if expected:
+            res = await self.sheet.batch_get(
+                [f"{self.tab}!{self.id_column}{row}" for row in expected.values()],
+                fields="valueRanges(values)")
+
+            for (pid, row), value_range in zip(expected.items(), res.get("valueRanges", [])):
+                values = value_range.get("values") or [[""]]
+                actual = values[0][0].strip() if values[0] else ""
+
+                if actual == str(pid):
+                    continue
+
+                moved.add(pid)
+                if self.rows.get(pid) == row:
+                    del self.rows[pid]
+                # whoever sits in that row now is known for free
+                if actual.isdigit():
+                    self.rows[int(actual)] = row
+
+        if moved - set(self.rows):
+            logging.warning(f"Rows moved in {self.tab} for ids {sorted(moved)}, re-reading id column")
+            await self.rebuild()
+
+        return {pid: self.rows.get(pid) for pid in ids}
@@ -1,60 +1,300 @@
 # sheets_async.py
 import asyncio
+import logging
+import random
 import time
-from typing import Any, Dict, Iterable, List, Optional, Sequence, Union
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Sequence, Union
 
 import httpx
 from google.oauth2.service_account import Credentials
 from google.auth.transport.requests import Request as GAuthRequest
 
 _DEFAULT_SCOPES = ["https://www.googleapis.com/auth/spreadsheets"]
+_DEFAULT_BASE_URL = "https://sheets.googleapis.com/v4/spreadsheets"
 _TOKEN_REFRESH_MARGIN = 60  # seconds
+_PROACTIVE_REFRESH_MARGIN = 300  # seconds before expiry the background task renews the token
 _RETRYABLE = {429, 500, 502, 503, 504}
+_SLOW_WAIT_WARNING = 5.0  # seconds in the quota queue before we log it
 
 
 class _SAAuth:
-    """Handles OAuth tokens for a service account in an async-friendly way."""
+    """Handles OAuth tokens for a service account in an async-friendly way.
+
+    A background task renews the token `_PROACTIVE_REFRESH_MARGIN` seconds
+    before it expires, so in the steady state `headers()` never waits on a
+    refresh or on the lock; the lazy refresh is only a fallback.
+    """
     def __init__(self, sa_json_path: str, scopes: Optional[Sequence[str]] = None):
         self.creds = Credentials.from_service_account_file(
             sa_json_path, scopes=scopes or _DEFAULT_SCOPES
         )
         self._lock = asyncio.Lock()
+        self._refresher: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refresh_failures = 0
+        self.last_refresh_latency = 0.0
+        self.max_refresh_latency = 0.0
+
+    def _expires_in(self) -> float:
+        if not self.creds.valid or not self.creds.expiry:
+            return 0.0
+        return self.creds.expiry.replace(tzinfo=timezone.utc).timestamp() - time.time()
+
+    async def _refresh(self):
+        started = time.monotonic()
+        try:
+            # refresh in a thread to avoid blocking the loop
+            await asyncio.to_thread(self.creds.refresh, GAuthRequest())
+        except Exception:
+            self.refresh_failures += 1
+            raise
+        latency = time.monotonic() - started
+        self.refreshes += 1
+        self.last_refresh_latency = latency
+        self.max_refresh_latency = max(self.max_refresh_latency, latency)
 
     async def _ensure_valid(self):
+        if self._expires_in() > _TOKEN_REFRESH_MARGIN:
+            return
         async with self._lock:
-            now = time.time()
-            if self.creds.valid and self.creds.expiry and now < self.creds.expiry.timestamp() - _TOKEN_REFRESH_MARGIN:
+            if self._expires_in() > _TOKEN_REFRESH_MARGIN:
                 return
-            # refresh in a thread to avoid blocking the loop
-            await asyncio.to_thread(self.creds.refresh, GAuthRequest())
+            if self.refreshes:
+                logging.warning("Sheets token refreshed inline, background refresher is behind")
+            await self._refresh()
+
+    async def _refresh_loop(self):
+        failures = 0
+        while True:
+            await asyncio.sleep(max(self._expires_in() - _PROACTIVE_REFRESH_MARGIN, 0))
+            try:
+                async with self._lock:
+                    if self._expires_in() <= _PROACTIVE_REFRESH_MARGIN:
+                        await self._refresh()
+                failures = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failures += 1
+                delay = min(5 * 2 ** failures, 120)
+                logging.error(f"Sheets token refresh failed, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+
+    def start(self):
+        """Start the background refresher (idempotent; needs a running loop)."""
+        if self._refresher is None or self._refresher.done():
+            self._refresher = asyncio.create_task(self._refresh_loop())
+
+    async def close(self):
+        if self._refresher is not None:
+            self._refresher.cancel()
+            await asyncio.gather(self._refresher, return_exceptions=True)
+            self._refresher = None
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "expires_in": self._expires_in(),
+            "refreshes": self.refreshes,
+            "refresh_failures": self.refresh_failures,
+            "last_refresh_latency": self.last_refresh_latency,
+            "max_refresh_latency": self.max_refresh_latency,
+        }
 
     async def headers(self) -> Dict[str, str]:
+        self.start()
         await self._ensure_valid()
         return {"Authorization": f"Bearer {self.creds.token}"}
 
 
+class _NoAuth:
+    """No Authorization header; for local stand-ins of the Sheets API."""
+    async def headers(self) -> Dict[str, str]:
+        return {}
+
+    async def close(self):
+        pass
+
+    def stats(self) -> Dict[str, float]:
+        return {}
+
+
+class TokenBucket:
+    """
+    FIFO async token bucket: `rate` tokens per `per` seconds, bursting up to `capacity`.
+
+    Callers queue in `acquire` instead of sending a request that would be
+    rejected; `pause` blocks the bucket for a while (e.g. after a 429 with
+    Retry-After) so waiting coroutines do not retry in lockstep.
+    """
+    def __init__(self, rate: float, per: float = 60.0, capacity: Optional[float] = None):
+        self.rate = rate / per
+        self.capacity = capacity if capacity is not None else rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = asyncio.Lock()  # asyncio.Lock wakes waiters in FIFO order
+        self.waiting = 0
+        self.acquired = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.pauses = 0
+
+    def _refill(self, now: float):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self) -> float:
+        """Wait for one token; returns the time spent waiting."""
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            async with self._lock:
+                while True:
+                    now = time.monotonic()
+                    if now < self._blocked_until:
+                        await asyncio.sleep(self._blocked_until - now)
+                        continue
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        break
+                    await asyncio.sleep((1 - self._tokens) / self.rate)
+        finally:
+            self.waiting -= 1
+
+        waited = time.monotonic() - started
+        self.acquired += 1
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def pause(self, seconds: float):
+        """Stop handing out tokens for `seconds` and drop the current burst allowance."""
+        self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+        self._tokens = 0
+        self._updated = time.monotonic()
+        self.pauses += 1
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "queue_depth": self.waiting,
+            "acquired": self.acquired,
+            "avg_wait": self.total_wait / self.acquired if self.acquired else 0.0,
+            "max_wait": self.max_wait,
+            "pauses": self.pauses,
+        }
+
+
+class QuotaGovernor:
+    """Client-side Sheets quota: separate per-minute budgets for reads and writes."""
+    def __init__(self, read_per_minute: float = 60, write_per_minute: float = 60):
+        self.buckets = {
+            "read": TokenBucket(read_per_minute),
+            "write": TokenBucket(write_per_minute),
+        }
+
+    async def acquire(self, kind: str):
+        waited = await self.buckets[kind].acquire()
+        if waited > _SLOW_WAIT_WARNING:
+            logging.warning(f"Sheets {kind} request waited {waited:.1f}s for quota")
+
+    def pause(self, kind: str, seconds: float):
+        self.buckets[kind].pause(seconds)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        return {kind: bucket.stats() for kind, bucket in self.buckets.items()}
+
+
+# Shared by every SheetsAsync instance: the quota is per project, not per client
+_quota_governor: Optional[QuotaGovernor] = None
+
+def get_quota_governor(read_per_minute: float = 60, write_per_minute: float = 60) -> QuotaGovernor:
+    """Get or create the process-wide governor (limits apply on first call only)."""
+    global _quota_governor
+    if _quota_governor is None:
+        _quota_governor = QuotaGovernor(read_per_minute, write_per_minute)
+    return _quota_governor
+
+
+def _retry_after(resp: httpx.Response) -> Optional[float]:
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), if present."""
+    value = resp.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class SingleFlight:
+    """
+    Lets concurrent callers for the same key share one in-flight call.
+
+    Keeps per-key counters: `calls` (all callers) and `coalesced`
+    (callers that joined an already running call instead of starting one).
+    """
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        stats = self.stats.setdefault(key, {"calls": 0, "coalesced": 0})
+        stats["calls"] += 1
+
+        fut = self._inflight.get(key)
+        if fut is not None:
+            stats["coalesced"] += 1
+            # shield so one cancelled waiter does not cancel the shared call
+            return await asyncio.shield(fut)
+
+        fut = asyncio.ensure_future(fn())
+        self._inflight[key] = fut
+        fut.add_done_callback(lambda f: self._forget(key, f))
+        return await asyncio.shield(fut)
+
+    def _forget(self, key: str, fut: asyncio.Future):
+        if self._inflight.get(key) is fut:
+            del self._inflight[key]
+        # avoid "exception was never retrieved" when every waiter was cancelled
+        if not fut.cancelled():
+            fut.exception()
+
+
 class SheetsAsync:
     """Async Google Sheets (Values + batchUpdate)."""
     def __init__(
         self,
         spreadsheet_id: str,
-        sa_json_path: str,
+        sa_json_path: Optional[str],
         *,
         scopes: Optional[Sequence[str]] = None,
         timeout: float = 30.0,
         client: Optional[httpx.AsyncClient] = None,
         retries: int = 5,
         backoff_base: float = 0.5,
+        governor: Optional[QuotaGovernor] = None,
+        base_url: str = _DEFAULT_BASE_URL,
     ):
-        self.base = "https://sheets.googleapis.com/v4/spreadsheets"
+        self.base = base_url
         self.spreadsheet_id = spreadsheet_id
-        self.auth = _SAAuth(sa_json_path, scopes or _DEFAULT_SCOPES)
+        # no service account means an unauthenticated local server (see scripts/fake_sheets_server.py)
+        self.auth = _SAAuth(sa_json_path, scopes or _DEFAULT_SCOPES) if sa_json_path else _NoAuth()
         self._own_client = client is None
         self.client = client or httpx.AsyncClient(timeout=timeout)
         self.retries = retries
         self.backoff_base = backoff_base
+        self.flight = SingleFlight()
+        self.governor = governor or get_quota_governor()
 
     async def close(self):
+        await self.auth.close()
         if self._own_client:
             await self.client.aclose()
 
@@ -63,7 +303,10 @@ class SheetsAsync:
         headers = kwargs.pop("headers", {})
         headers.update(await self.auth.headers())
 
+        kind = "read" if method == "GET" else "write"
+
         for attempt in range(self.retries):
+            await self.governor.acquire(kind)
             resp = await self.client.request(method, url, headers=headers, **kwargs)
             if resp.status_code < 400:
                 # Sheets returns JSON on success
@@ -72,7 +315,14 @@ class SheetsAsync:
                 return resp.text
 
             if resp.status_code in _RETRYABLE:
-                await asyncio.sleep((2 ** attempt) * self.backoff_base)
+                # server hint first, otherwise exponential backoff with full jitter
+                delay = _retry_after(resp)
+                if delay is None:
+                    delay = random.uniform(0, (2 ** attempt) * self.backoff_base)
+                if resp.status_code == 429:
+                    # the quota is shared, so hold back every queued request, not just this one
+                    self.governor.pause(kind, delay)
+                await asyncio.sleep(delay)
                 continue
 
             # raise with body for debugging
@@ -83,16 +333,35 @@ class SheetsAsync:
             )
         raise RuntimeError("Exceeded retry attempts for Sheets API")
 
+    def auth_stats(self) -> Dict[str, float]:
+        """Token lifetime left plus refresh counters and latency."""
+        return self.auth.stats()
+
+    def quota_stats(self) -> Dict[str, Dict[str, float]]:
+        """Queue depth and wait times of the shared read/write quota buckets."""
+        return self.governor.stats()
+
+    def flight_stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-range counters of read calls and how many of them were coalesced.
+
+        Coalesced callers receive the same response object, so treat it as read-only.
+        """
+        return {k: dict(v) for k, v in self.flight.stats.items()}
+
     # ---- VALUES API ----
     async def read(self, a1_range: str) -> Dict[str, Any]:
         url = f"{self.base}/{self.spreadsheet_id}/values/{a1_range}"
-        return await self._request("GET", url)
+        return await self.flight.do(a1_range, lambda: self._request("GET", url))
 
-    async def batch_get(self, ranges: Iterable[str]) -> Dict[str, Any]:
+    async def batch_get(self, ranges: Iterable[str], *, fields: Optional[str] = None) -> Dict[str, Any]:
+        """Read several ranges in one request; `fields` is an optional response mask."""
         url = f"{self.base}/{self.spreadsheet_id}/values:batchGet"
         # multiple 'ranges' query params; httpx accepts list values
         params = [("ranges", r) for r in ranges]
-        return await self._request("GET", url, params=params)
+        if fields:
+            params.append(("fields", fields))
+        key = "batchGet:" + "|".join(r for _, r in params)
+        return await self.flight.do(key, lambda: self._request("GET", url, params=params))
 
     async def update(
         self,
@@ -122,6 +391,17 @@ class SheetsAsync:
         body = {"values": values}
         return await self._request("POST", url, params=params, json=body)
 
+    async def values_batch_update(
+        self,
+        data: List[Dict[str, Any]],
+        *,
+        value_input_option: str = "USER_ENTERED",
+    ) -> Dict[str, Any]:
+        """Write several ranges in one request; `data` items are {"range": ..., "values": [[...]]}."""
+        url = f"{self.base}/{self.spreadsheet_id}/values:batchUpdate"
+        body = {"valueInputOption": value_input_option, "data": data}
+        return await self._request("POST", url, json=body)
+
     # ---- SPREADSHEETS batchUpdate (formatting, add sheets, etc.) ----
     async def batch_update(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
         url = f"{self.base}/{self.spreadsheet_id}:batchUpdate"
@@ -129,9 +409,11 @@ class SheetsAsync:
         return await self._request("POST", url, json=body)
 
     # ---- Convenience helpers ----
-    async def get_spreadsheet(self, *, include_grid_data: bool = False) -> Dict[str, Any]:
+    async def get_spreadsheet(self, *, include_grid_data: bool = False, fields: Optional[str] = None) -> Dict[str, Any]:
         url = f"{self.base}/{self.spreadsheet_id}"
         params = {"includeGridData": str(include_grid_data).lower()}
+        if fields:
+            params["fields"] = fields
         return await self._request("GET", url, params=params)
 
     async def get_sheet_id_by_title(self, title: str) -> Optional[int]:
@@ -0,0 +1,141 @@
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from .sheets_async import SheetsAsync
+
+
+CellValue = str | int | float | None
+
+
+class SheetsOutbox:
+    """
+    Durable write-behind queue for single-cell Sheets edits.
+
+    Pending writes live in a Redis hash keyed by A1 cell, so repeated edits
+    of the same cell collapse into the latest value. A flush atomically moves
+    the pending hash to an "inflight" hash and sends it as one
+    values:batchUpdate call; the inflight hash is deleted only after Google
+    accepts it, so a failed flush or a restart replays it on the next run.
+
+    Cell keys may be logical (e.g. "Tab!H@<person id>"); `resolve` maps them
+    to A1 ranges right before the write, and keys it maps to None are dropped.
+    """
+
+    def __init__(
+        self,
+        sheet: SheetsAsync,
+        redis: Redis,
+        *,
+        flush_interval: float = 5.0,
+        on_flush: Callable[[list[str]], Awaitable[None]] | None = None,
+        resolve: Callable[[list[str]], Awaitable[dict[str, str | None]]] | None = None,
+    ):
+        self.sheet = sheet
+        self.redis = redis
+        self.flush_interval = flush_interval
+        self.on_flush = on_flush
+        self.resolve = resolve
+        self.pending_key = f"sheets_outbox:{sheet.spreadsheet_id}:pending"
+        self.inflight_key = f"sheets_outbox:{sheet.spreadsheet_id}:inflight"
+        self._wakeup = asyncio.Event()
+
+    async def enqueue(self, cells: dict[str, CellValue]) -> None:
+        """
+        Store cell writes ({"Tab!B5": value, ...}) in one atomic HSET.
+        """
+        if not cells:
+            return
+
+        await self.redis.hset(
+            self.pending_key,
+            mapping={cell: json.dumps(value, ensure_ascii=False) for cell, value in cells.items()})
+
+    def wakeup(self) -> None:
+        """Ask the worker to flush now instead of waiting for the next interval."""
+        self._wakeup.set()
+
+    async def flush(self) -> int:
+        """
+        Send the inflight batch left by a previous run (if any), then the pending one.
+        Returns the number of cells written.
+        """
+        written = 0
+
+        if await self.redis.exists(self.inflight_key):
+            written += await self._send_inflight()
+
+        try:
+            # RENAME is atomic, so edits enqueued during the send go to a fresh pending hash
+            await self.redis.rename(self.pending_key, self.inflight_key)
+        except ResponseError:
+            # no pending writes
+            return written
+
+        written += await self._send_inflight()
+        return written
+
+    async def _send_inflight(self) -> int:
+
+        raw: dict[bytes, bytes] = await self.redis.hgetall(self.inflight_key)
+        if not raw:
+            return 0
+
+        values = {cell.decode(): json.loads(value) for cell, value in raw.items()}
+
+        if self.resolve is not None:
+            ranges = await self.resolve(list(values))
+        else:
+            ranges = {cell: cell for cell in values}
+
+        data = [
+            {"range": ranges[cell], "values": [[value]]}
+            for cell, value in values.items() if ranges.get(cell)
+        ]
+
+        for cell in values:
+            if not ranges.get(cell):
+                logging.warning(f"Sheets outbox dropped {cell}: no row to write to")
+
+        if data:
+            await self.sheet.values_batch_update(data)
+        await self.redis.delete(self.inflight_key)
+
+        cells = [item["range"] for item in data]
+        logging.info(f"Sheets outbox flushed {len(cells)} cells")
+
+        if self.on_flush is not None:
+            try:
+                await self.on_flush(cells)
+            except Exception as e:
+                logging.error(f"Sheets outbox on_flush callback failed: {e}")
+
+        return len(cells)
+
+    async def run(self) -> None:
+        """
+        Worker loop: flush every `flush_interval` seconds (or on wakeup), backing off on errors.
+        """
+        delay = self.flush_interval
+
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            try:
+                await self.flush()
+                delay = self.flush_interval
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                delay = min(delay * 2, 300)
+                logging.error(f"Sheets outbox flush failed, retrying in {delay:.0f}s: {e}")
@@ -0,0 +1,154 @@
+import json
+import random
+import asyncio
+import logging
+from typing import Any
+
+import httpx
+from telegraph.utils import html_to_nodes
+
+from ..config import Config
+from .sheets_async import TokenBucket
+
+
+_RETRYABLE = {429, 500, 502, 503, 504}
+
+
+class TelegraphError(Exception):
+    """Telegraph answered {"ok": false} with an error that retrying will not fix."""
+
+
+def _flood_wait(error: str) -> float | None:
+    """Seconds from a FLOOD_WAIT_<n> error, None for any other error."""
+
+    if error.startswith("FLOOD_WAIT_"):
+        try:
+            return float(error.rsplit("_", 1)[-1])
+        except ValueError:
+            return None
+    return None
+
+
+class TelegraphAsync:
+    """
+    Async Telegraph API client.
+
+    One pooled httpx client is shared by all calls. Requests go through a
+    token bucket; 5xx, timeouts and FLOOD_WAIT are retried with full-jitter
+    backoff (FLOOD_WAIT also pauses the bucket for every queued call).
+    """
+
+    def __init__(
+            self,
+            access_token: str,
+            *,
+            base_url: str,
+            timeout: float,
+            retries: int,
+            per_minute: int,
+            backoff_base: float = 0.5):
+        self.access_token = access_token
+        self.base_url = base_url.rstrip("/")
+        self.retries = retries
+        self.backoff_base = backoff_base
+        self.bucket = TokenBucket(per_minute)
+        self._client = httpx.AsyncClient(
+            timeout=httpx.Timeout(timeout),
+            limits=httpx.Limits(max_connections=5, max_keepalive_connections=5))
+        self.calls = 0
+        self.retried = 0
+        self.failed = 0
+
+    async def method(self, name: str, values: dict[str, Any], path: str = "") -> Any:
+
+        url = f"{self.base_url}/{name}/{path}" if path else f"{self.base_url}/{name}"
+        data = {"access_token": self.access_token, **values}
+
+        for attempt in range(self.retries):
+            await self.bucket.acquire()
+            delay = random.uniform(0, (2 ** attempt) * self.backoff_base)
+
+            try:
+                resp = await self._client.post(url, data=data)
+            except (httpx.TimeoutException, httpx.TransportError) as e:
+                logging.warning(f"Telegraph {name} attempt {attempt + 1} failed: {e!r}")
+                self.retried += 1
+                await asyncio.sleep(delay)
+                continue
+
+            if resp.status_code in _RETRYABLE:
+                self.retried += 1
+                await asyncio.sleep(delay)
+                continue
+
+            resp.raise_for_status()
+            body = resp.json()
+
+            if body.get("ok"):
+                self.calls += 1
+                return body["result"]
+
+            error = str(body.get("error"))
+            wait = _flood_wait(error)
+            if wait is None:
+                self.failed += 1
+                raise TelegraphError(error)
+
+            self.retried += 1
+            self.bucket.pause(wait)
+            await asyncio.sleep(wait)
+
+        self.failed += 1
+        raise RuntimeError(f"Exceeded retry attempts for Telegraph {name}")
+
+    async def edit_page(
+            self,
+            path: str,
+            title: str,
+            html_content: str,
+            author_name: str | None = None,
+            author_url: str | None = None) -> dict:
+
+        return await self.method("editPage", path=path, values={
+            "title": title,
+            "content": json.dumps(html_to_nodes(html_content), ensure_ascii=False, separators=(",", ":")),
+            "author_name": author_name or "",
+            "author_url": author_url or "",
+            "return_content": "false",
+        })
+
+    async def close(self) -> None:
+        await self._client.aclose()
+
+    def stats(self) -> dict[str, Any]:
+        return {"calls": self.calls, "retried": self.retried, "failed": self.failed, **self.bucket.stats()}
+
+
+_telegraph_client: TelegraphAsync | None = None
+
+
+def get_telegraph_client(config: Config) -> TelegraphAsync:
+    """
+    Get or create the shared Telegraph client.
+    """
+    global _telegraph_client
+
+    if _telegraph_client is None:
+        _telegraph_client = TelegraphAsync(
+            config.telegraph.access_token,
+            base_url=config.telegraph.base_url,
+            timeout=config.telegraph.timeout,
+            retries=config.telegraph.retries,
+            per_minute=config.telegraph.per_minute)
+
+    return _telegraph_client
+
+
+async def close_telegraph_client() -> None:
+
+    global _telegraph_client
+
+    if _telegraph_client is not None:
+        await _telegraph_client.close()
+        _telegraph_client = None
+        logging.info("Telegraph client closed")
@@ -0,0 +1,164 @@
+import asyncio
+import logging
+
+from redis.asyncio import Redis
+
+from ..config import Config
+from ..custom_types import TelegraphPage
+from .redis_pool import get_redis
+from .telegraph_async import TelegraphAsync, get_telegraph_client
+
+
+PUBLISHED_HASHES_KEY = "telegraph_published"
+
+
+class TelegraphPublishQueue:
+    """
+    Debounced Telegraph publishing.
+
+    Pages are submitted per path; a page is published once no newer version
+    of it has been submitted for `quiet_period` seconds, so one editing
+    session ends in a single editPage. Before publishing, the content hash is
+    compared with the last published one (a Redis hash, path -> sha256) and
+    unchanged pages are not sent at all.
+    """
+
+    def __init__(self, client: TelegraphAsync, redis: Redis, *, quiet_period: float, key: str = PUBLISHED_HASHES_KEY):
+        self.client = client
+        self.redis = redis
+        self.quiet_period = quiet_period
+        self.key = key
+        self._pending: dict[str, TelegraphPage] = {}
+        self._timers: dict[str, asyncio.Task] = {}
+        self._locks: dict[str, asyncio.Lock] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self.submitted = 0
+        self.coalesced = 0
+        self.published = 0
+        self.unchanged = 0
+        self.failed = 0
+
+    def submit(self, page: TelegraphPage) -> None:
+        """
+        Queue the latest version of a page; restarts its quiet period.
+        """
+        self.submitted += 1
+        if page.path in self._pending:
+            self.coalesced += 1
+        self._pending[page.path] = page
+
+        timer = self._timers.pop(page.path, None)
+        if timer is not None:
+            timer.cancel()
+
+        task = asyncio.create_task(self._publish_later(page.path))
+        self._timers[page.path] = task
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _publish_later(self, path: str) -> None:
+
+        await asyncio.sleep(self.quiet_period)
+
+        # past this point a newer submit starts its own timer instead of cancelling this publish
+        if self._timers.get(path) is asyncio.current_task():
+            del self._timers[path]
+
+        page = self._pending.pop(path, None)
+        if page is None:
+            return
+
+        try:
+            await self.publish(page)
+        except Exception as e:
+            logging.error(f"Can't publish Telegraph page {path}: {e!r}")
+
+    async def publish(self, page: TelegraphPage, force: bool = False) -> bool:
+        """
+        Publish a page now unless its content is already live. Returns False for a skipped no-op.
+        """
+        lock = self._locks.setdefault(page.path, asyncio.Lock())
+
+        async with lock:
+            content_hash = page.content_hash
+
+            if not force:
+                published = await self.redis.hget(self.key, page.path)
+                if published is not None and published.decode() == content_hash:
+                    self.unchanged += 1
+                    return False
+
+            try:
+                await self.client.edit_page(
+                    path=page.path,
+                    title=page.title,
+                    html_content=page.html_content,
+                    author_name=page.author_name,
+                    author_url=page.author_url)
+            except Exception:
+                self.failed += 1
+                raise
+
+            await self.redis.hset(self.key, page.path, content_hash)
+            self.published += 1
+
+        return True
+
+    async def close(self, timeout: float) -> None:
+        """
+        Publish what is still waiting for its quiet period, giving up after `timeout` seconds.
+        """
+        for timer in self._timers.values():
+            timer.cancel()
+        self._timers.clear()
+
+        pending, self._pending = list(self._pending.values()), {}
+        for page in pending:
+            task = asyncio.create_task(self.publish(page))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        if self._tasks:
+            _, unfinished = await asyncio.wait(set(self._tasks), timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict[str, int]:
+
+        return {
+            "submitted": self.submitted,
+            "coalesced": self.coalesced,
+            "published": self.published,
+            "unchanged": self.unchanged,
+            "failed": self.failed,
+            "waiting": len(self._pending),
+        }
+
+
+_telegraph_queue: TelegraphPublishQueue | None = None
+
+
+def get_telegraph_queue(config: Config) -> TelegraphPublishQueue:
+    """
+    Get or create the process-wide Telegraph publishing queue.
+    """
+    global _telegraph_queue
+
+    if _telegraph_queue is None:
+        _telegraph_queue = TelegraphPublishQueue(
+            get_telegraph_client(config),
+            get_redis(config.redis.temp),
+            quiet_period=config.telegraph.quiet_period)
+
+    return _telegraph_queue
+
+
+async def close_telegraph_queue(timeout: float) -> None:
+
+    global _telegraph_queue
+
+    if _telegraph_queue is not None:
+        await _telegraph_queue.close(timeout)
+        logging.info(f"Telegraph queue closed: {_telegraph_queue.stats()}")
+        _telegraph_queue = None